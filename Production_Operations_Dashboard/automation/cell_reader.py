@@ -0,0 +1,277 @@
+"""
+公式 + 缓存值单元格读取器
+
+功能:
+1. 直接流式解析 xlsx 工作表 XML，一次遍历同时得到每个单元格的公式与 Excel 缓存的计算结果
+   (openpyxl 只能二选一: data_only=False 得到公式，data_only=True 得到缓存值，需要解析两遍)
+2. 标记缓存值状态: 缺失 (公式无缓存值)、可能过期 (工作簿要求打开时全部重算)、错误值
+3. 共享公式按主单元格平移展开，日期格式单元格转换为 datetime
+
+用法:
+    with WorkbookCellReader(path) as reader:
+        for row in reader.iter_rows("05_Daily_Orders"):
+            ...
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from xml.etree import ElementTree
+import posixpath
+import re
+import zipfile
+
+from openpyxl.formula.translate import Translator
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+DOC_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+SHARED_STRINGS_REL_TYPE = DOC_REL_NS + "/sharedStrings"
+STYLES_REL_TYPE = DOC_REL_NS + "/styles"
+
+COORDINATE_PATTERN = re.compile(r"([A-Z]+)(\d+)")
+
+# 单元格状态
+VALUE = "value"      # 普通值 (无公式)
+CACHED = "cached"    # 公式且有缓存值
+MISSING = "missing"  # 公式但没有缓存值 (例如由 openpyxl 写入后未在 Excel 中重算)
+STALE = "stale"      # 公式有缓存值，但工作簿标记为打开时全部重算，缓存值不可信
+ERROR = "error"      # 缓存值为错误值 (#REF! 等)
+
+ISSUE_STATUSES = (MISSING, STALE, ERROR)
+
+
+def _tag(name: str) -> str:
+    return f"{{{MAIN_NS}}}{name}"
+
+
+def _cast_number(text: str):
+    """数值文本 -> int / float (含小数点或指数时为 float)"""
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+@dataclass(frozen=True)
+class CellReading:
+    coordinate: str
+    value: Any
+    formula: Optional[str] = None
+    status: str = VALUE
+
+    @property
+    def has_issue(self) -> bool:
+        return self.status in ISSUE_STATUSES
+
+
+class WorkbookCellReader:
+    """一次打开 xlsx 包，按需流式读取工作表 (同时返回公式与缓存值)"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.archive = zipfile.ZipFile(self.path)
+        self._shared_strings: Optional[List[str]] = None
+        self._read_workbook()
+
+    # ------------------------------------------------------------------
+    # 包结构
+    # ------------------------------------------------------------------
+
+    def _read_relationships(self, rels_part: str, base_dir: str) -> Dict[str, tuple]:
+        if rels_part not in self.archive.namelist():
+            return {}
+        root = ElementTree.fromstring(self.archive.read(rels_part))
+        relationships = {}
+        for rel in root.iter(f"{{{PKG_REL_NS}}}Relationship"):
+            target = rel.get("Target", "")
+            if target.startswith("/"):
+                part = target.lstrip("/")
+            else:
+                part = posixpath.normpath(posixpath.join(base_dir, target))
+            relationships[rel.get("Id")] = (rel.get("Type"), part)
+        return relationships
+
+    def _read_workbook(self) -> None:
+        root_rels = self._read_relationships("_rels/.rels", "")
+        workbook_part = next(
+            (part for rel_type, part in root_rels.values() if rel_type.endswith("/officeDocument")),
+            "xl/workbook.xml",
+        )
+        base_dir = posixpath.dirname(workbook_part)
+        rels_part = posixpath.join(base_dir, "_rels", posixpath.basename(workbook_part) + ".rels")
+        relationships = self._read_relationships(rels_part, base_dir)
+
+        root = ElementTree.fromstring(self.archive.read(workbook_part))
+        self.sheet_parts: Dict[str, str] = {}
+        for sheet in root.iter(_tag("sheet")):
+            rel = relationships.get(sheet.get(f"{{{DOC_REL_NS}}}id"))
+            if rel is not None:
+                self.sheet_parts[sheet.get("name")] = rel[1]
+
+        workbook_pr = root.find(_tag("workbookPr"))
+        date1904 = workbook_pr is not None and workbook_pr.get("date1904") in ("1", "true")
+        self.epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+
+        # Excel 保存的文件不带 fullCalcOnLoad；由脚本写入的文件带此标记，缓存值可能已过期
+        calc_pr = root.find(_tag("calcPr"))
+        self.full_calc_on_load = calc_pr is not None and calc_pr.get("fullCalcOnLoad") in ("1", "true")
+
+        self._shared_strings_part = next(
+            (part for rel_type, part in relationships.values() if rel_type == SHARED_STRINGS_REL_TYPE), None
+        )
+        styles_part = next(
+            (part for rel_type, part in relationships.values() if rel_type == STYLES_REL_TYPE), None
+        )
+        self.date_styles, self.timedelta_styles = self._read_date_styles(styles_part)
+
+    def _read_date_styles(self, styles_part: Optional[str]) -> tuple:
+        """返回 (日期格式的样式下标, 其中时长格式的样式下标)"""
+        if styles_part is None or styles_part not in self.archive.namelist():
+            return set(), set()
+        root = ElementTree.fromstring(self.archive.read(styles_part))
+        formats = dict(BUILTIN_FORMATS)
+        num_fmts = root.find(_tag("numFmts"))
+        if num_fmts is not None:
+            for num_fmt in num_fmts:
+                formats[int(num_fmt.get("numFmtId"))] = num_fmt.get("formatCode", "")
+        cell_xfs = root.find(_tag("cellXfs"))
+        date_styles, timedelta_styles = set(), set()
+        for index, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+            number_format = formats.get(int(xf.get("numFmtId", 0)), "")
+            if is_date_format(number_format):
+                date_styles.add(index)
+                if is_timedelta_format(number_format):
+                    timedelta_styles.add(index)
+        return date_styles, timedelta_styles
+
+    @property
+    def shared_strings(self) -> List[str]:
+        if self._shared_strings is None:
+            self._shared_strings = []
+            if self._shared_strings_part in self.archive.namelist():
+                root = ElementTree.fromstring(self.archive.read(self._shared_strings_part))
+                for item in root.iter(_tag("si")):
+                    self._shared_strings.append(_rich_text(item))
+        return self._shared_strings
+
+    @property
+    def sheetnames(self) -> List[str]:
+        return list(self.sheet_parts)
+
+    # ------------------------------------------------------------------
+    # 单元格
+    # ------------------------------------------------------------------
+
+    def _convert(self, cell_type: Optional[str], text: str, style: int) -> Any:
+        """与 openpyxl (data_only=True) 的取值规则一致"""
+        if cell_type == "s":
+            return self.shared_strings[int(text)]
+        if cell_type in ("str", "e"):
+            return text
+        if cell_type == "b":
+            return bool(int(text))
+        if cell_type == "d":
+            return from_ISO8601(text)
+        number = _cast_number(text)
+        if style in self.date_styles:
+            try:
+                return from_excel(number, self.epoch, timedelta=style in self.timedelta_styles)
+            except (OverflowError, ValueError):
+                return "#VALUE!"
+        return number
+
+    def iter_rows(self, sheet_name: str) -> Iterator[List[Optional[CellReading]]]:
+        """逐行产出单元格 (列表下标 = 列号 - 1，空位为 None)；缺失的行产出空列表。"""
+        if sheet_name not in self.sheet_parts:
+            raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+        shared_formulas: Dict[str, tuple] = {}
+        next_row = 1
+        with self.archive.open(self.sheet_parts[sheet_name]) as stream:
+            for _, element in ElementTree.iterparse(stream, events=("end",)):
+                if element.tag != _tag("row"):
+                    continue
+                row_number = int(element.get("r", next_row))
+                while next_row < row_number:
+                    yield []
+                    next_row += 1
+
+                cells: List[Optional[CellReading]] = []
+                for cell in element.iter(_tag("c")):
+                    coordinate = cell.get("r")
+                    if coordinate is None:
+                        coordinate = f"{get_column_letter(len(cells) + 1)}{row_number}"
+                    column = column_index_from_string(COORDINATE_PATTERN.match(coordinate)[1])
+                    cells.extend([None] * (column - 1 - len(cells)))
+                    cells.append(self._read_cell(cell, coordinate, shared_formulas))
+
+                yield cells
+                next_row = row_number + 1
+                element.clear()
+
+    def _read_cell(self, cell, coordinate: str, shared_formulas: Dict[str, tuple]) -> CellReading:
+        cell_type = cell.get("t")
+        style = int(cell.get("s", 0))
+
+        formula = None
+        formula_element = cell.find(_tag("f"))
+        if formula_element is not None:
+            text = formula_element.text
+            shared_index = formula_element.get("si")
+            if formula_element.get("t") == "shared" and shared_index is not None:
+                if text:
+                    shared_formulas[shared_index] = (coordinate, f"={text}")
+                    formula = f"={text}"
+                elif shared_index in shared_formulas:
+                    origin, master = shared_formulas[shared_index]
+                    formula = Translator(master, origin=origin).translate_formula(coordinate)
+            elif text:
+                formula = f"={text}"
+
+        # 公式结果为空字符串时 Excel 写出 <v/>: 值与 openpyxl 一致为 None，但缓存值并不缺失
+        empty_string = False
+        if cell_type == "inlineStr":
+            inline = cell.find(_tag("is"))
+            value = _rich_text(inline) if inline is not None else None
+        else:
+            text = cell.findtext(_tag("v")) or None
+            value = None if text is None else self._convert(cell_type, text, style)
+            empty_string = cell_type == "str" and text is None and cell.find(_tag("v")) is not None
+
+        if cell_type == "e" and value is not None:
+            status = ERROR
+        elif formula is None:
+            status = VALUE
+        elif value is None and not empty_string:
+            status = MISSING
+        elif self.full_calc_on_load:
+            status = STALE
+        else:
+            status = CACHED
+        return CellReading(coordinate, value, formula, status)
+
+    def close(self) -> None:
+        self.archive.close()
+
+    def __enter__(self) -> "WorkbookCellReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _rich_text(element) -> str:
+    """共享字符串 / 内联字符串: 拼接所有 <t> (忽略注音 rPh)"""
+    parts = []
+    for child in element:
+        if child.tag == _tag("t"):
+            parts.append(child.text or "")
+        elif child.tag == _tag("r"):
+            parts.extend(t.text or "" for t in child.iter(_tag("t")))
+    return "".join(parts)
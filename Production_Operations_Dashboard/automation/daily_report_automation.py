@@ -4,10 +4,15 @@ Production Daily Report Automation System (Yield Feature Removed)
 
 功能:
 1. 从 v39_Normalized.xlsx 提取当日生产数据
-2. 计算关键指标 (订单数、产量等)
+2. 计算关键指标 (订单数、产量、Raw_kg / Cages 需求等)
 3. 生成日报文件 (Excel 格式)
 4. 发送邮件通知
 5. 记录执行日志
+6. 历史补跑: 按数据源快照并行补齐缺失日期的日报
+
+用法:
+    python daily_report_automation.py
+    python daily_report_automation.py --backfill 2026-01-01 2026-01-31 [--snapshot ID ...] [--workers 4]
 
 作者: Claude Code
 创建日期: 2026-01-01
@@ -16,7 +21,17 @@ Production Daily Report Automation System (Yield Feature Removed)
 
 import openpyxl
 import pandas as pd
-from datetime import datetime, timedelta
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from openpyxl.packaging.core import DocumentProperties
+from openpyxl.utils import get_column_letter
+from xml.etree import ElementTree
+import argparse
+import tempfile
+import time
+import zipfile
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -27,6 +42,10 @@ import os
 from pathlib import Path
 import json
 
+from cell_reader import ISSUE_STATUSES, WorkbookCellReader
+from formula_engine import FormulaEngine, is_number
+from snapshot_store import DEFAULT_ROOT as SNAPSHOT_ROOT, SnapshotStore, file_digest
+
 # ============================================================================
 # 配置部分
 # ============================================================================
@@ -49,6 +68,27 @@ class Config:
         "supervisor@company.com"
     ]
 
+    # 读取的工作表与列 (只读取这些列)
+    ORDERS_SHEET = '05_Daily_Orders'
+    PROGRESS_SHEET = '13_Progress_Track'
+
+    # 物料需求指标 (进程内计算公式)，按标签定位单元格: 表头行中的列名 + 订单类型列中的行名；
+    # 任一标签找不到时报错 (版式变化不会静默读错单元格)
+    PLANNING_SHEET = '14_Production_Planning'
+    PLANNING_LABEL_HEADER = '订单类型'
+    PLANNING_RAW_KG_HEADER = 'Raw_kg需求'
+    PLANNING_CAGES_HEADER = 'Cages需要'
+    PLANNING_ORDER_TYPES = ['TrayPack', 'BulkPack', 'Bagging', '总计']
+    # 回退到缓存值的公式单元格最多在日志中列出的个数
+    MAX_REPORTED_FALLBACK_CELLS = 20
+
+    # 数据源快照 (每次运行记录一次，供历史补跑使用，见 snapshot_store.py)
+    SNAPSHOT_DIR = SNAPSHOT_ROOT
+    SNAPSHOT_LABEL = 'v39_Normalized'
+
+    # 历史补跑的进程数
+    BACKFILL_WORKERS = min(4, os.cpu_count() or 1)
+
     # 日志配置
     LOG_LEVEL = logging.INFO
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -86,44 +126,142 @@ logger = setup_logging()
 class DailyReportGenerator:
     """日报生成器 - 核心业务逻辑"""
 
-    def __init__(self, excel_path):
-        """初始化"""
+    def __init__(self, excel_path, report_date=None, source_sha256=None):
+        """初始化 (report_date 默认为今天；source_sha256 为数据源文件哈希，默认在生成日报时计算)"""
         self.excel_path = excel_path
         self.wb = None
-        self.report_date = datetime.now().strftime("%Y-%m-%d")
+        self.report_date = (report_date or datetime.now()).strftime("%Y-%m-%d")
         self.report_datetime = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.daily_data = {}
+        # 读取的列中公式缓存值有问题的单元格数: {工作表: Counter(状态)}
+        self.cell_issues = {}
         self.report_file = None
+        self.source_sha256 = source_sha256
 
         logger.info(f"初始化日报生成器, 报告日期: {self.report_date}")
 
+    def snapshot_source(self):
+        """记录数据源快照 (内容未变化时只新增清单)；失败不影响日报"""
+        try:
+            manifest = SnapshotStore(Config.SNAPSHOT_DIR).snapshot(Path(self.excel_path), Config.SNAPSHOT_LABEL)
+            self.source_sha256 = manifest.file_sha256
+        except Exception as e:
+            logger.warning(f"记录数据源快照失败: {str(e)}")
+        return True
+
     def load_data(self):
-        """从 Excel 加载数据"""
+        """以流式模式打开 Excel (整个流程共用这一个句柄，一次解析同时得到公式与缓存值)"""
         try:
             logger.info(f"加载 Excel 文件: {self.excel_path}")
-            self.wb = openpyxl.load_workbook(self.excel_path, data_only=False)
+            self.wb = WorkbookCellReader(self.excel_path)
+            if self.wb.full_calc_on_load:
+                logger.warning("工作簿标记为打开时全部重算，公式缓存值可能已过期")
             logger.info("Excel 文件加载成功")
             return True
         except Exception as e:
             logger.error(f"加载 Excel 失败: {str(e)}")
             return False
 
+    def close(self):
+        """关闭工作簿 (流式读取会一直占用文件句柄)"""
+        if self.wb is not None:
+            self.wb.close()
+            self.wb = None
+
+    def read_columns(self, sheet_name, columns):
+        """流式读取工作表中指定列
+
+        返回 (数据行数, {列名: 值列表})。行数与 pd.read_excel(header=0) 一致:
+        表头之后到最后一个非空行为止；同名列取第一列；工作表中没有的列不出现在结果中。
+        值为 Excel 缓存的计算结果；所读列中缓存值缺失/过期/错误的单元格计入 self.cell_issues。
+        """
+        rows = self.wb.iter_rows(sheet_name)
+        header = [cell.value if cell else None for cell in next(rows, [])]
+        positions = {}
+        for index, name in enumerate(header):
+            if name in columns and name not in positions:
+                positions[name] = index
+
+        values = {name: [] for name in positions}
+        issues = Counter()
+        row_count = 0
+        pending_blank = 0
+        for row in rows:
+            if all(cell is None or cell.value is None for cell in row):
+                # 末尾空行不计入 (pandas 会裁掉)，中间的空行计入
+                pending_blank += 1
+            else:
+                row_count += pending_blank + 1
+                for name in positions:
+                    values[name].extend([None] * pending_blank)
+                pending_blank = 0
+
+            for name, index in positions.items():
+                cell = row[index] if index < len(row) else None
+                if cell is not None and cell.has_issue:
+                    issues[cell.status] += 1
+                if pending_blank == 0:
+                    values[name].append(cell.value if cell is not None else None)
+
+        if issues:
+            self.cell_issues[sheet_name] = issues
+            logger.warning(
+                f"{sheet_name}: 所读列中有公式缓存值问题 "
+                + ", ".join(f"{status}={count}" for status, count in sorted(issues.items()))
+            )
+        return row_count, values
+
+    def locate_planning_kpis(self):
+        """按标签定位物料需求指标单元格，返回 [(订单类型, Raw_kg 单元格, Cages 单元格)]"""
+        headers = None
+        found = {}
+        for row_number, row in enumerate(self.wb.iter_rows(Config.PLANNING_SHEET), start=1):
+            texts = [
+                str(cell.value).strip() if cell is not None and cell.value is not None else ''
+                for cell in row
+            ]
+            if headers is None:
+                if Config.PLANNING_LABEL_HEADER in texts:
+                    headers = texts
+                continue
+            label_index = headers.index(Config.PLANNING_LABEL_HEADER)
+            label = texts[label_index] if label_index < len(texts) else ''
+            if label in Config.PLANNING_ORDER_TYPES and label not in found:
+                found[label] = row_number
+                if len(found) == len(Config.PLANNING_ORDER_TYPES):
+                    break
+
+        if headers is None:
+            raise ValueError(
+                f"{Config.PLANNING_SHEET} 中未找到表头 '{Config.PLANNING_LABEL_HEADER}'"
+            )
+        missing = [
+            name
+            for name in (Config.PLANNING_RAW_KG_HEADER, Config.PLANNING_CAGES_HEADER)
+            if name not in headers
+        ] + [label for label in Config.PLANNING_ORDER_TYPES if label not in found]
+        if missing:
+            raise ValueError(f"{Config.PLANNING_SHEET} 中未找到标签: {', '.join(missing)}")
+
+        raw_kg_letter = get_column_letter(headers.index(Config.PLANNING_RAW_KG_HEADER) + 1)
+        cages_letter = get_column_letter(headers.index(Config.PLANNING_CAGES_HEADER) + 1)
+        return [
+            (label, f"{raw_kg_letter}{found[label]}", f"{cages_letter}{found[label]}")
+            for label in Config.PLANNING_ORDER_TYPES
+        ]
+
     def extract_daily_data(self):
         """从各工作表提取当日数据"""
         try:
             logger.info("开始提取当日数据...")
 
             # 1. 从 05_Daily_Orders 提取订单数据
-            daily_orders_sheet = self.wb['05_Daily_Orders']
-            df_orders = pd.read_excel(
-                self.excel_path,
-                sheet_name='05_Daily_Orders',
-                header=0
-            )
+            total_orders, orders = self.read_columns(Config.ORDERS_SHEET, {'Status'})
 
-            self.daily_data['total_orders'] = len(df_orders)
-            self.daily_data['completed_orders'] = len(df_orders[df_orders['Status'] == 'Completed']) \
-                if 'Status' in df_orders.columns else 0
+            self.daily_data['total_orders'] = total_orders
+            self.daily_data['completed_orders'] = sum(
+                1 for status in orders['Status'] if status == 'Completed'
+            ) if 'Status' in orders else 0
             self.daily_data['completion_rate'] = (
                 self.daily_data['completed_orders'] / self.daily_data['total_orders'] * 100
             ) if self.daily_data['total_orders'] > 0 else 0
@@ -133,20 +271,48 @@ class DailyReportGenerator:
                        f"完成率={self.daily_data['completion_rate']:.1f}%")
 
             # 2. 从 13_Progress_Track 提取进度数据
-            df_progress = pd.read_excel(
-                self.excel_path,
-                sheet_name='13_Progress_Track',
-                header=0
-            )
+            _, progress = self.read_columns(Config.PROGRESS_SHEET, {'Cases_Produced'})
 
-            if 'Cases_Produced' in df_progress.columns:
+            if 'Cases_Produced' in progress:
                 total_cases = pd.to_numeric(
-                    df_progress['Cases_Produced'],
+                    pd.Series(progress['Cases_Produced'], dtype=object),
                     errors='coerce'
                 ).sum()
                 self.daily_data['total_cases'] = total_cases
                 logger.info(f"生产统计: 总产量={total_cases:.0f} cases")
 
+            # 3. 从 14_Production_Planning 计算物料需求 (只计算指标依赖的公式，不依赖 Excel 重算)
+            # 物料需求是可选部分: 布局不符时记录警告并省略，不影响日报其余部分
+            if Config.PLANNING_SHEET in self.wb.sheetnames:
+                engine = FormulaEngine(self.wb)
+                try:
+                    self.daily_data['planning'] = [
+                        (
+                            label,
+                            engine.value(Config.PLANNING_SHEET, raw_kg_cell),
+                            engine.value(Config.PLANNING_SHEET, cages_cell),
+                        )
+                        for label, raw_kg_cell, cages_cell in self.locate_planning_kpis()
+                    ]
+                except ValueError as e:
+                    logger.warning(f"{e}，日报不含物料需求部分: {self.excel_path}")
+                else:
+                    logger.info(f"物料需求统计: 计算了 {engine.evaluated} 个公式单元格")
+                if engine.unsupported:
+                    fallback_cells = [
+                        f"{sheet}!{get_column_letter(col)}{row} ({reason})"
+                        for (sheet, row, col), reason in engine.unsupported.items()
+                    ]
+                    logger.warning(
+                        f"{len(fallback_cells)} 个公式含不支持的函数或引用，使用 Excel 缓存值: "
+                        + "; ".join(fallback_cells[:Config.MAX_REPORTED_FALLBACK_CELLS])
+                        + (" ..." if len(fallback_cells) > Config.MAX_REPORTED_FALLBACK_CELLS else "")
+                    )
+            else:
+                logger.warning(
+                    f"数据源中没有 {Config.PLANNING_SHEET} 工作表，日报不含物料需求部分: {self.excel_path}"
+                )
+
             logger.info("当日数据提取完成")
             return True
 
@@ -167,6 +333,7 @@ class DailyReportGenerator:
             # 设置列宽
             report_ws.column_dimensions['A'].width = 25
             report_ws.column_dimensions['B'].width = 20
+            report_ws.column_dimensions['C'].width = 20
 
             # 标题
             report_ws['A1'] = f"生产日报 - {self.report_date}"
@@ -183,6 +350,11 @@ class DailyReportGenerator:
             report_ws[f'B{row}'] = self.report_datetime
             row += 2
 
+            # 文档属性 identifier 记录数据源哈希，历史补跑据此判断日报是否需要重新生成
+            if self.source_sha256 is None:
+                self.source_sha256 = file_digest(Path(self.excel_path))
+            report_wb.properties.identifier = self.source_sha256
+
             # 核心数据部分
             report_ws[f'A{row}'] = "=== 一、生产概览 ==="
             row += 1
@@ -203,8 +375,38 @@ class DailyReportGenerator:
             report_ws[f'B{row}'] = f"{self.daily_data.get('total_cases', 0):.0f}"
             row += 2
 
+            # 数据说明: 公式缓存值缺失/过期时，以上数字未必是最新计算结果
+            if self.cell_issues:
+                report_ws[f'A{row}'] = "=== 数据说明 ==="
+                row += 1
+                for sheet_name, issues in self.cell_issues.items():
+                    report_ws[f'A{row}'] = f"{sheet_name}:"
+                    report_ws[f'B{row}'] = ", ".join(
+                        f"{status} {issues[status]}" for status in ISSUE_STATUSES if issues[status]
+                    )
+                    row += 1
+                row += 1
+
+            # 物料需求部分
+            if self.daily_data.get('planning'):
+                report_ws[f'A{row}'] = "=== 二、物料需求 ==="
+                row += 1
+
+                report_ws[f'A{row}'] = "订单类型"
+                report_ws[f'B{row}'] = "Raw_kg需求"
+                report_ws[f'C{row}'] = "Cages需要"
+                row += 1
+
+                for label, raw_kg, cages in self.daily_data['planning']:
+                    report_ws[f'A{row}'] = label
+                    report_ws[f'B{row}'] = self._format_kpi(raw_kg)
+                    report_ws[f'C{row}'] = self._format_kpi(cages)
+                    row += 1
+                row += 1
+
             # 建议部分
-            report_ws[f'A{row}'] = "=== 二、建议 ==="
+            section = "三" if self.daily_data.get('planning') else "二"
+            report_ws[f'A{row}'] = f"=== {section}、建议 ==="
             row += 1
 
             report_ws[f'A{row}'] = "继续维持当前生产状态"
@@ -224,6 +426,13 @@ class DailyReportGenerator:
             logger.error(f"生成日报文件失败: {str(e)}")
             return False
 
+    @staticmethod
+    def _format_kpi(value):
+        """数字保留 1 位小数；空值显示为 "-"，错误值 (#REF! 等) 原样显示"""
+        if value is None or value == '':
+            return '-'
+        return f"{value:.1f}" if is_number(value) else str(value)
+
     def send_email_notification(self):
         """发送邮件通知"""
         try:
@@ -283,6 +492,14 @@ class DailyReportGenerator:
 
     def _generate_email_body(self):
         """生成邮件正文 (HTML 格式)"""
+        planning_html = ""
+        if self.daily_data.get('planning'):
+            items = "".join(
+                f"<li>{label}: Raw_kg {self._format_kpi(raw_kg)}, Cages {self._format_kpi(cages)}</li>"
+                for label, raw_kg, cages in self.daily_data['planning']
+            )
+            planning_html = f"<h2>📦 物料需求</h2><ul>{items}</ul>"
+
         html_body = f"""
         <html>
             <head>
@@ -299,6 +516,7 @@ class DailyReportGenerator:
                     <li>完成率: {self.daily_data.get('completion_rate', 0):.1f}%</li>
                     <li>总产量: {self.daily_data.get('total_cases', 0):.0f} Cases</li>
                 </ul>
+{planning_html}
 
                 <hr>
                 <p style="color: #666; font-size: 12px;">
@@ -318,6 +536,7 @@ class DailyReportGenerator:
         logger.info("=" * 80)
 
         steps = [
+            ("记录数据源快照", self.snapshot_source),
             ("加载 Excel 数据", self.load_data),
             ("提取当日数据", self.extract_daily_data),
             ("生成日报文件", self.generate_report_file),
@@ -325,13 +544,16 @@ class DailyReportGenerator:
         ]
 
         success = True
-        for step_name, step_func in steps:
-            logger.info(f"执行: {step_name}...")
-            if not step_func():
-                logger.error(f"失败: {step_name}")
-                success = False
-                break
-            logger.info(f"完成: {step_name}")
+        try:
+            for step_name, step_func in steps:
+                logger.info(f"执行: {step_name}...")
+                if not step_func():
+                    logger.error(f"失败: {step_name}")
+                    success = False
+                    break
+                logger.info(f"完成: {step_name}")
+        finally:
+            self.close()
 
         logger.info("=" * 80)
         if success:
@@ -343,12 +565,206 @@ class DailyReportGenerator:
         return success
 
 
+# ============================================================================
+# 历史补跑
+# ============================================================================
+
+# 补跑结果状态
+GENERATED = "generated"      # 已生成
+SKIPPED = "skipped"          # 日报已存在 (数据源哈希一致，或旧日报未记录哈希)
+NO_SNAPSHOT = "no_snapshot"  # 该日期及之前都没有数据源快照
+FAILED = "failed"
+
+
+@dataclass
+class BackfillResult:
+    report_date: date
+    status: str
+    snapshot_id: str = ""
+    report_file: str = ""
+    message: str = ""
+
+
+@dataclass
+class BackfillSummary:
+    start: date
+    end: date
+    results: list = field(default_factory=list)
+    seconds: float = 0.0
+
+    def counts(self):
+        return Counter(result.status for result in self.results)
+
+
+def report_path(report_date):
+    return Path(Config.REPORT_DIR) / f"Daily_Report_{report_date:%Y-%m-%d}.xlsx"
+
+
+REPORT_READ_ERRORS = (OSError, KeyError, zipfile.BadZipFile, ElementTree.ParseError)
+
+
+def read_report_source_hash(report_file):
+    """读取日报文档属性中记录的数据源哈希 (旧日报没有记录时返回 None，文件无法读取时抛出异常)"""
+    with zipfile.ZipFile(report_file) as archive:
+        core = ElementTree.fromstring(archive.read("docProps/core.xml"))
+    return DocumentProperties.from_tree(core).identifier
+
+
+def existing_report_status(report_file, source_sha256):
+    """已有日报是否可跳过: 返回跳过说明，需要重新生成时返回 None"""
+    if not report_file.exists():
+        return None
+    try:
+        recorded = read_report_source_hash(report_file)
+    except REPORT_READ_ERRORS:
+        logger.warning(f"已有日报无法读取，将重新生成: {report_file}")
+        return None
+    if recorded is None:
+        return "旧日报未记录数据源哈希，视为已存在 (--force 重新生成)"
+    if recorded == source_sha256:
+        return "数据源哈希一致"
+    return None
+
+
+def select_snapshots(snapshots, report_dates):
+    """每个日期取当天结束前最近的快照: 返回 {日期: 快照清单或 None}"""
+    ordered = sorted(snapshots, key=lambda manifest: manifest.created)
+    selected = {}
+    for report_date in report_dates:
+        day_end = datetime.combine(report_date, datetime.max.time()).isoformat(timespec="seconds")
+        candidates = [manifest for manifest in ordered if manifest.created <= day_end]
+        selected[report_date] = candidates[-1] if candidates else None
+    return selected
+
+
+def generate_snapshot_reports(source_path, snapshot_id, source_sha256, report_dates):
+    """进程池任务: 同一快照只加载/提取一次，为其对应的每个日期写出日报 (补跑不发邮件)"""
+    generator = DailyReportGenerator(source_path, source_sha256=source_sha256)
+    try:
+        extracted = generator.load_data() and generator.extract_daily_data()
+    finally:
+        generator.close()
+
+    results = []
+    for report_date in report_dates:
+        if not extracted:
+            results.append(BackfillResult(report_date, FAILED, snapshot_id, message="加载或提取数据失败"))
+            continue
+        generator.report_date = report_date.strftime("%Y-%m-%d")
+        if generator.generate_report_file():
+            results.append(BackfillResult(report_date, GENERATED, snapshot_id, str(generator.report_file)))
+        else:
+            results.append(BackfillResult(report_date, FAILED, snapshot_id, message="生成日报文件失败"))
+    return results
+
+
+def backfill_reports(start, end, snapshot_ids=None, workers=None, force=False):
+    """补齐 [start, end] 内缺失或数据源已变化的日报
+
+    end 晚于今天时截止到今天 (未来日期没有数据)。
+    snapshot_ids 为空时使用 Config.SNAPSHOT_LABEL 下的全部快照；
+    当天没有快照的日期 (如定时任务漏跑) 使用此前最近的快照并记录警告。
+    已存在且数据源哈希一致的日报跳过；未记录哈希的旧日报视为已存在 (force=True 时全部重新生成)。
+    """
+    started = time.perf_counter()
+    workers = Config.BACKFILL_WORKERS if workers is None else workers
+    today = date.today()
+    if end > today:
+        logger.warning(f"补跑结束日期 {end} 晚于今天，截止到 {today}")
+        end = today
+    summary = BackfillSummary(start, end)
+    report_dates = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+    store = SnapshotStore(Config.SNAPSHOT_DIR)
+    if snapshot_ids:
+        snapshots = [store.get(snapshot_id) for snapshot_id in snapshot_ids]
+    else:
+        snapshots = store.list_snapshots(Config.SNAPSHOT_LABEL)
+
+    # 按快照分组: 同一快照对应的日期数据相同，只需提取一次
+    groups = {}
+    for report_date, manifest in select_snapshots(snapshots, report_dates).items():
+        if manifest is None:
+            summary.results.append(BackfillResult(report_date, NO_SNAPSHOT, message="该日期之前没有数据源快照"))
+            continue
+        if datetime.fromisoformat(manifest.created).date() != report_date:
+            logger.warning(f"{report_date} 当天没有快照，使用此前的快照 {manifest.snapshot_id}")
+        existing = report_path(report_date)
+        skip_reason = None if force else existing_report_status(existing, manifest.file_sha256)
+        if skip_reason:
+            summary.results.append(
+                BackfillResult(report_date, SKIPPED, manifest.snapshot_id, str(existing), skip_reason)
+            )
+            continue
+        groups.setdefault(manifest.snapshot_id, (manifest, []))[1].append(report_date)
+
+    logger.info(
+        f"历史补跑 {start} ~ {end}: 待生成 {sum(len(dates) for _, dates in groups.values())} 份, "
+        f"涉及 {len(groups)} 个快照"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        tasks = [
+            (str(store.restore(snapshot_id, Path(tmp) / f"{snapshot_id}.xlsx")), snapshot_id, manifest.file_sha256, dates)
+            for snapshot_id, (manifest, dates) in groups.items()
+        ]
+        if workers <= 1 or len(tasks) <= 1:
+            for task in tasks:
+                summary.results.extend(generate_snapshot_reports(*task))
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+                futures = [executor.submit(generate_snapshot_reports, *task) for task in tasks]
+                for future in futures:
+                    summary.results.extend(future.result())
+
+    summary.results.sort(key=lambda result: result.report_date)
+    summary.seconds = round(time.perf_counter() - started, 2)
+    log_backfill_summary(summary)
+    return summary
+
+
+def log_backfill_summary(summary):
+    counts = summary.counts()
+    logger.info("=" * 80)
+    logger.info(
+        f"历史补跑完成 {summary.start} ~ {summary.end} ({summary.seconds:.2f}s): "
+        f"生成 {counts[GENERATED]}, 跳过 {counts[SKIPPED]}, "
+        f"无快照 {counts[NO_SNAPSHOT]}, 失败 {counts[FAILED]}"
+    )
+    for result in summary.results:
+        if result.status in (NO_SNAPSHOT, FAILED):
+            logger.warning(f"  {result.report_date}: {result.status} {result.message}")
+    logger.info("=" * 80)
+
+
 # ============================================================================
 # 主程序
 # ============================================================================
 
-def main():
+def parse_date(text):
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def main(argv=None):
     """主函数"""
+    parser = argparse.ArgumentParser(description="生产日报自动化")
+    parser.add_argument("--backfill", nargs=2, type=parse_date, metavar=("START", "END"),
+                        help="补跑日期范围 (YYYY-MM-DD)")
+    parser.add_argument("--snapshot", nargs="+", default=None, help="补跑使用的快照 ID (默认按标签取全部快照)")
+    parser.add_argument("--workers", type=int, default=None, help="补跑进程数")
+    parser.add_argument("--force", action="store_true", help="忽略已有日报，全部重新生成")
+    args = parser.parse_args(argv)
+
+    if args.backfill:
+        try:
+            summary = backfill_reports(*args.backfill, args.snapshot, args.workers, args.force)
+        except Exception as e:
+            logger.error(f"历史补跑异常: {str(e)}", exc_info=True)
+            return 1
+        counts = summary.counts()
+        print(f"\n历史补跑: 生成 {counts[GENERATED]}, 跳过 {counts[SKIPPED]}, "
+              f"无快照 {counts[NO_SNAPSHOT]}, 失败 {counts[FAILED]} ({summary.seconds:.2f}s)")
+        return 1 if counts[FAILED] else 0
+
     try:
         generator = DailyReportGenerator(Config.EXCEL_PATH)
         success = generator.run()
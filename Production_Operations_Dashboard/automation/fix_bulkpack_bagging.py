@@ -14,13 +14,16 @@ fix_bulkpack_bagging.py - 修复 BulkPack 和 Bagging 转换逻辑
 import openpyxl
 from openpyxl.utils import get_column_letter
 from datetime import datetime
-import shutil
 import os
 
+from snapshot_store import SnapshotStore
+
 # 配置
 INPUT_FILE = 'Production_Operations_Dashboard/data/v39_Dashboard_Enhanced.xlsx'
 OUTPUT_FILE = 'Production_Operations_Dashboard/data/v39_Dashboard_Enhanced.xlsx'
-BACKUP_FILE = f'Production_Operations_Dashboard/data/v39_Dashboard_Enhanced_backup_bulkpack_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+# 备份记录到快照存储 (按部件去重)，用 snapshot_store.py restore 还原
+SNAPSHOT_DIR = 'Production_Operations_Dashboard/data/snapshots'
+BACKUP_LABEL = 'v39_Dashboard_Enhanced_before_bulkpack'
 LOG_FILE = f'Production_Operations_Dashboard/logs/fix_bulkpack_bagging_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
 
 os.makedirs('Production_Operations_Dashboard/logs', exist_ok=True)
@@ -33,8 +36,9 @@ def log(message):
         f.write(log_line + '\n')
 
 def backup_file():
-    shutil.copy(INPUT_FILE, BACKUP_FILE)
-    log(f"Backup created: {BACKUP_FILE}")
+    manifest = SnapshotStore(SNAPSHOT_DIR).snapshot(INPUT_FILE, BACKUP_LABEL)
+    log(f"Backup snapshot created: {manifest.snapshot_id} ({manifest.new_objects} new parts)")
+    return manifest.snapshot_id
 
 def add_conversion_columns_to_cone_line(wb):
     """
@@ -236,7 +240,7 @@ def main():
     log("=" * 60)
 
     # 创建备份
-    backup_file()
+    backup_id = backup_file()
 
     # 加载工作簿
     log(f"Loading workbook: {INPUT_FILE}")
@@ -265,7 +269,7 @@ def main():
     log(f"Total formulas added: {total_formulas}")
     log(f"  - 10_Cone_Line: {cone_formulas}")
     log(f"  - 04_Bagging_Order: {bagging_formulas}")
-    log(f"Backup file: {BACKUP_FILE}")
+    log(f"Backup snapshot: {backup_id}")
     log(f"Log file: {LOG_FILE}")
     log("=" * 60)
 
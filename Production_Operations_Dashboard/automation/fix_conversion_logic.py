@@ -15,13 +15,16 @@ fix_conversion_logic.py - 修复生产物料转换逻辑
 import openpyxl
 from openpyxl.utils import get_column_letter
 from datetime import datetime
-import shutil
 import os
 
+from snapshot_store import SnapshotStore
+
 # 配置
 INPUT_FILE = 'Production_Operations_Dashboard/data/v39_Dashboard_Enhanced.xlsx'
 OUTPUT_FILE = 'Production_Operations_Dashboard/data/v39_Dashboard_Enhanced.xlsx'
-BACKUP_FILE = f'Production_Operations_Dashboard/data/v39_Dashboard_Enhanced_backup_before_fix_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+# 备份记录到快照存储 (按部件去重)，用 snapshot_store.py restore 还原
+SNAPSHOT_DIR = 'Production_Operations_Dashboard/data/snapshots'
+BACKUP_LABEL = 'v39_Dashboard_Enhanced_before_fix'
 LOG_FILE = f'Production_Operations_Dashboard/logs/fix_conversion_logic_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
 
 # 确保日志目录存在
@@ -37,8 +40,9 @@ def log(message):
 
 def backup_file():
     """创建备份"""
-    shutil.copy(INPUT_FILE, BACKUP_FILE)
-    log(f"Backup created: {BACKUP_FILE}")
+    manifest = SnapshotStore(SNAPSHOT_DIR).snapshot(INPUT_FILE, BACKUP_LABEL)
+    log(f"Backup snapshot created: {manifest.snapshot_id} ({manifest.new_objects} new parts)")
+    return manifest.snapshot_id
 
 def add_conversion_columns_to_daily_orders(wb):
     """
@@ -195,7 +199,7 @@ def main():
     log("=" * 60)
 
     # 创建备份
-    backup_file()
+    backup_id = backup_file()
 
     # 加载工作簿
     log(f"Loading workbook: {INPUT_FILE}")
@@ -218,7 +222,7 @@ def main():
     log("=" * 60)
     log("Fix Conversion Logic - Complete")
     log(f"Total formulas added: {formulas_added}")
-    log(f"Backup file: {BACKUP_FILE}")
+    log(f"Backup snapshot: {backup_id}")
     log(f"Log file: {LOG_FILE}")
     log("=" * 60)
 
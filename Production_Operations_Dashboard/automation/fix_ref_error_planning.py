@@ -16,16 +16,19 @@ fix_ref_error_planning.py - 修复 14_Production_Planning Row 6 的 #REF! 错误
 
 import openpyxl
 from datetime import datetime
-import shutil
 import os
 
+from snapshot_store import SnapshotStore
+
 # 配置
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 
 INPUT_FILE = os.path.join(PROJECT_ROOT, 'data', 'v39_Dashboard_Enhanced.xlsx')
 OUTPUT_FILE = os.path.join(PROJECT_ROOT, 'data', 'v39_Dashboard_Enhanced.xlsx')
-BACKUP_FILE = os.path.join(PROJECT_ROOT, 'data', f'v39_Dashboard_Enhanced_backup_ref_fix_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx')
+# 备份记录到快照存储 (按部件去重)，用 snapshot_store.py restore 还原
+SNAPSHOT_DIR = os.path.join(PROJECT_ROOT, 'data', 'snapshots')
+BACKUP_LABEL = 'v39_Dashboard_Enhanced_before_ref_fix'
 LOG_FILE = os.path.join(PROJECT_ROOT, 'logs', f'fix_ref_error_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
 
 os.makedirs(os.path.join(PROJECT_ROOT, 'logs'), exist_ok=True)
@@ -39,8 +42,9 @@ def log(message):
 
 def backup_file():
     """创建备份文件"""
-    shutil.copy(INPUT_FILE, BACKUP_FILE)
-    log(f"Backup created: {BACKUP_FILE}")
+    manifest = SnapshotStore(SNAPSHOT_DIR).snapshot(INPUT_FILE, BACKUP_LABEL)
+    log(f"Backup snapshot created: {manifest.snapshot_id} ({manifest.new_objects} new parts)")
+    return manifest.snapshot_id
 
 def check_resource_plan_structure(wb):
     """
@@ -184,7 +188,7 @@ def main():
     log("=" * 60)
 
     # 创建备份
-    backup_file()
+    backup_id = backup_file()
 
     # 加载工作簿
     log(f"Loading workbook: {INPUT_FILE}")
@@ -219,7 +223,7 @@ def main():
 
     log("=" * 60)
     log("Fix #REF! Error - Complete")
-    log(f"Backup file: {BACKUP_FILE}")
+    log(f"Backup snapshot: {backup_id}")
     log(f"Log file: {LOG_FILE}")
     log("=" * 60)
 
@@ -0,0 +1,1139 @@
+"""
+生产工作簿公式计算引擎 (进程内，无需 Excel 重算)
+
+功能:
+1. 解析本目录脚本写入的公式: SUM、SUMIF、SUMIFS、SUMPRODUCT、XLOOKUP、INDEX、MATCH、ROUNDUP、IF、
+   MAX、AVERAGE、AND、ISNUMBER、IFERROR/IFNA，以及 + - * / ^ & % 和比较运算
+2. 按需计算: 只计算所取单元格及其依赖，计算时登记单元格依赖图
+3. 缓存区域取值 (SUMIF / XLOOKUP 反复引用的整列) 与 XLOOKUP 精确查找索引
+4. set_value 修改输入后只让依赖它的单元格失效，下次取值时增量重算
+5. 含不支持函数的公式回退到 Excel 缓存值，并记录在 unsupported 中
+
+用法:
+    with WorkbookCellReader(path) as reader:
+        engine = FormulaEngine(reader)
+        cages = engine.value("14_Production_Planning", "G9")
+        engine.set_value("05_Daily_Orders", "M2", 12)
+        cages = engine.value("14_Production_Planning", "G9")   # 只重算受影响的单元格
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_UP, Decimal
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import re
+
+from openpyxl.formula import Tokenizer
+from openpyxl.formula.tokenizer import Token
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+from openpyxl.utils.datetime import to_excel
+
+from cell_reader import CACHED, ERROR, STALE, CellReading, WorkbookCellReader
+
+
+# ============================================================================
+# 值与错误
+# ============================================================================
+
+@dataclass(frozen=True)
+class ExcelError:
+    code: str
+
+    def __str__(self) -> str:
+        return self.code
+
+
+DIV0 = ExcelError("#DIV/0!")
+NA = ExcelError("#N/A")
+NAME = ExcelError("#NAME?")
+NUM = ExcelError("#NUM!")
+REF = ExcelError("#REF!")
+VALUE = ExcelError("#VALUE!")
+# 非 Excel 错误码: 循环引用 (Excel 会提示并返回 0)
+CIRCULAR = ExcelError("#CIRCULAR!")
+
+ERROR_CODES = {error.code: error for error in (DIV0, NA, NAME, NUM, REF, VALUE)}
+ERROR_CODES["#NULL!"] = ExcelError("#NULL!")
+
+
+class UnsupportedFormula(ValueError):
+    """公式含引擎不支持的函数或语法"""
+
+
+CellKey = Tuple[str, int, int]
+
+
+@dataclass(frozen=True)
+class Area:
+    """已解析到具体工作表与边界的区域"""
+
+    sheet: str
+    min_row: int
+    min_col: int
+    max_row: int
+    max_col: int
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.max_row - self.min_row + 1, self.max_col - self.min_col + 1
+
+    def contains(self, row: int, col: int) -> bool:
+        return self.min_row <= row <= self.max_row and self.min_col <= col <= self.max_col
+
+
+def is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_array(value: Any) -> bool:
+    return isinstance(value, list)
+
+
+def _parse_number(text: str) -> Optional[float]:
+    try:
+        return float(text.strip())
+    except ValueError:
+        return None
+
+
+def to_number(value: Any):
+    """算术运算的取值规则: 空=0，TRUE=1，数字文本转数字，其他文本 #VALUE!"""
+    if isinstance(value, ExcelError) or is_number(value):
+        return value
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        number = _parse_number(value)
+        return VALUE if number is None else number
+    return VALUE
+
+
+def to_bool(value: Any):
+    if isinstance(value, (ExcelError, bool)):
+        return value
+    if value is None:
+        return False
+    if is_number(value):
+        return value != 0
+    if isinstance(value, str) and value.upper() in ("TRUE", "FALSE"):
+        return value.upper() == "TRUE"
+    return VALUE
+
+
+def to_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if is_number(value):
+        if float(value).is_integer():
+            return str(int(value))
+        return f"{value:.15g}"
+    return str(value)
+
+
+def _type_rank(value: Any) -> int:
+    if isinstance(value, bool):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+def compare(left: Any, right: Any) -> int:
+    """Excel 比较: 数字 < 文本 < 逻辑值；文本不区分大小写；空值按对方类型取 0 / "" / FALSE"""
+    if left is None:
+        left = right.__class__() if isinstance(right, (str, bool)) else 0
+    if right is None:
+        right = left.__class__() if isinstance(left, (str, bool)) else 0
+    left_rank, right_rank = _type_rank(left), _type_rank(right)
+    if left_rank != right_rank:
+        return -1 if left_rank < right_rank else 1
+    if left_rank == 1:
+        left, right = left.lower(), right.lower()
+    return (left > right) - (left < right)
+
+
+def _from_cell(reading: Optional[CellReading], epoch) -> Any:
+    """单元格存储值 -> 计算用的值 (日期时间按 Excel 序列值参与计算)"""
+    if reading is None:
+        return None
+    value = reading.value
+    if value is None:
+        # 公式缓存的空字符串 (读取器给出 None 但状态不是 MISSING)
+        return "" if reading.formula and reading.status in (CACHED, STALE) else None
+    if reading.status == ERROR and value in ERROR_CODES:
+        return ERROR_CODES[value]
+    if isinstance(value, (datetime, date, time)):
+        return to_excel(value, epoch)
+    if isinstance(value, timedelta):
+        return value.total_seconds() / 86400
+    return value
+
+
+# ============================================================================
+# 解析
+# ============================================================================
+
+@dataclass(frozen=True)
+class Literal:
+    value: Any
+
+
+@dataclass(frozen=True)
+class Missing:
+    """省略的参数，如 XLOOKUP(a,b,c,,1) 中的第 4 个参数"""
+
+
+@dataclass(frozen=True)
+class Ref:
+    """单元格/区域引用；行列为 None 表示整列/整行"""
+
+    sheet: Optional[str]
+    min_row: Optional[int]
+    min_col: Optional[int]
+    max_row: Optional[int]
+    max_col: Optional[int]
+    intersect: bool = False
+
+
+@dataclass(frozen=True)
+class Unary:
+    op: str
+    operand: Any
+
+
+@dataclass(frozen=True)
+class Binary:
+    op: str
+    left: Any
+    right: Any
+
+
+@dataclass(frozen=True)
+class Call:
+    name: str
+    args: Tuple[Any, ...]
+
+
+@dataclass(frozen=True)
+class ParsedFormula:
+    node: Any
+    refs: Tuple[Ref, ...]
+
+
+INFIX_PRECEDENCE = {
+    "=": 1, "<>": 1, "<": 1, ">": 1, "<=": 1, ">=": 1,
+    "&": 2,
+    "+": 3, "-": 3,
+    "*": 4, "/": 4,
+    "^": 5,
+}
+# 前缀负号比乘方优先 (=-2^2 为 4)，百分号最优先
+PREFIX_PRECEDENCE = 6
+
+FUNCTION_PREFIXES = ("_XLFN._XLWS.", "_XLFN.", "_XLWS.")
+UNKNOWN_FUNCTION_PREFIX = "_XLUDF."
+CELL_ADDRESS = re.compile(r"\$?[A-Za-z]{1,3}\$?\d+(:\$?[A-Za-z]{1,3}\$?\d+)?$")
+RANGE_ADDRESS = re.compile(r"(\$?[A-Za-z]{1,3}:\$?[A-Za-z]{1,3}|\$?\d+:\$?\d+)$")
+
+
+def parse_reference(text: str):
+    intersect = text.startswith("@")
+    text = text.lstrip("@")
+    if "#REF!" in text:
+        return Literal(REF)
+
+    sheet, address = None, text
+    if "!" in text:
+        sheet, _, address = text.rpartition("!")
+        if sheet.startswith("'") and sheet.endswith("'"):
+            sheet = sheet[1:-1].replace("''", "'")
+        if sheet.startswith("[") or ":" in sheet:
+            raise UnsupportedFormula(f"外部或三维引用: {text}")
+
+    if not (CELL_ADDRESS.match(address) or RANGE_ADDRESS.match(address)):
+        raise UnsupportedFormula(f"名称引用: {text}")
+    min_col, min_row, max_col, max_row = range_boundaries(address.replace("$", "").upper())
+    return Ref(sheet, min_row, min_col, max_row, max_col, intersect)
+
+
+class _Parser:
+    def __init__(self, formula: str):
+        self.tokens = [
+            token for token in Tokenizer(formula).items if token.type != Token.WSPACE
+        ]
+        self.position = 0
+        self.refs: List[Ref] = []
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def advance(self) -> Token:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse(self) -> ParsedFormula:
+        node = self.expression(0)
+        if self.peek() is not None:
+            raise UnsupportedFormula(f"无法解析: {self.peek().value}")
+        return ParsedFormula(node, tuple(self.refs))
+
+    def expression(self, min_precedence: int):
+        left = self.primary()
+        while True:
+            token = self.peek()
+            if token is None:
+                return left
+            if token.type == Token.OP_POST:
+                self.advance()
+                left = Binary("/", left, Literal(100))
+                continue
+            precedence = INFIX_PRECEDENCE.get(token.value) if token.type == Token.OP_IN else None
+            if precedence is None or precedence < min_precedence:
+                return left
+            self.advance()
+            left = Binary(token.value, left, self.expression(precedence + 1))
+
+    def primary(self):
+        token = self.peek()
+        if token is None:
+            raise UnsupportedFormula("公式不完整")
+        self.advance()
+
+        if token.type == Token.OPERAND:
+            if token.subtype == Token.NUMBER:
+                return Literal(float(token.value))
+            if token.subtype == Token.TEXT:
+                return Literal(token.value[1:-1].replace('""', '"'))
+            if token.subtype == Token.LOGICAL:
+                return Literal(token.value.upper() == "TRUE")
+            if token.subtype == Token.ERROR:
+                return Literal(ERROR_CODES.get(token.value.upper(), ExcelError(token.value)))
+            node = parse_reference(token.value)
+            if isinstance(node, Ref):
+                self.refs.append(node)
+            return node
+
+        if token.type == Token.OP_PRE:
+            return Unary(token.value, self.expression(PREFIX_PRECEDENCE))
+
+        if token.type == Token.PAREN and token.subtype == Token.OPEN:
+            node = self.expression(0)
+            self.expect(Token.PAREN)
+            return node
+
+        if token.type == Token.FUNC and token.subtype == Token.OPEN:
+            return self.call(token.value[:-1].upper())
+
+        raise UnsupportedFormula(f"不支持的语法: {token.value}")
+
+    def expect(self, token_type: str) -> None:
+        token = self.peek()
+        if token is None or token.type != token_type or token.subtype != Token.CLOSE:
+            raise UnsupportedFormula("括号不匹配")
+        self.advance()
+
+    def call(self, name: str) -> Call:
+        for prefix in FUNCTION_PREFIXES:
+            if name.startswith(prefix):
+                name = name[len(prefix):]
+                break
+        # Excel 不认识的函数保存为 _xludf.NAME，在 Excel 中同样计算为 #NAME?
+        unknown = name.startswith(UNKNOWN_FUNCTION_PREFIX)
+        if not unknown and name not in FUNCTIONS and name not in LAZY_FUNCTIONS:
+            raise UnsupportedFormula(f"不支持的函数: {name}")
+
+        args = self.arguments()
+        return Literal(NAME) if unknown else Call(name, tuple(args))
+
+    def arguments(self) -> list:
+        args = []
+        token = self.peek()
+        if token is not None and token.type == Token.FUNC and token.subtype == Token.CLOSE:
+            self.advance()
+            return args
+        while True:
+            token = self.peek()
+            if token is not None and (
+                token.type == Token.SEP or (token.type == Token.FUNC and token.subtype == Token.CLOSE)
+            ):
+                args.append(Missing())
+            else:
+                args.append(self.expression(0))
+            token = self.peek()
+            if token is None:
+                raise UnsupportedFormula("括号不匹配")
+            self.advance()
+            if token.type == Token.FUNC and token.subtype == Token.CLOSE:
+                return args
+            if token.type != Token.SEP or token.subtype != Token.ARG:
+                raise UnsupportedFormula(f"不支持的语法: {token.value}")
+
+
+def parse_formula(formula: str) -> ParsedFormula:
+    if not formula.startswith("="):
+        formula = f"={formula}"
+    return _Parser(formula).parse()
+
+
+# ============================================================================
+# 函数
+# ============================================================================
+
+def _arithmetic(op: str, left: Any, right: Any):
+    left, right = to_number(left), to_number(right)
+    if isinstance(left, ExcelError):
+        return left
+    if isinstance(right, ExcelError):
+        return right
+    if op == "+":
+        return left + right
+    if op == "-":
+        return left - right
+    if op == "*":
+        return left * right
+    if op == "/":
+        return DIV0 if right == 0 else left / right
+    try:
+        result = left ** right
+    except (OverflowError, ZeroDivisionError):
+        return NUM
+    return NUM if isinstance(result, complex) else result
+
+
+COMPARISONS: Dict[str, Callable[[int], bool]] = {
+    "=": lambda order: order == 0,
+    "<>": lambda order: order != 0,
+    "<": lambda order: order < 0,
+    ">": lambda order: order > 0,
+    "<=": lambda order: order <= 0,
+    ">=": lambda order: order >= 0,
+}
+
+
+def apply_operator(op: str, left: Any, right: Any):
+    if isinstance(left, ExcelError):
+        return left
+    if isinstance(right, ExcelError):
+        return right
+    if op in COMPARISONS:
+        return COMPARISONS[op](compare(left, right))
+    if op == "&":
+        return to_text(left) + to_text(right)
+    return _arithmetic(op, left, right)
+
+
+def _first_error(values) -> Optional[ExcelError]:
+    return next((value for value in values if isinstance(value, ExcelError)), None)
+
+
+def _wildcard_pattern(text: str) -> re.Pattern:
+    parts = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == "~" and index + 1 < len(text):
+            parts.append(re.escape(text[index + 1]))
+            index += 2
+            continue
+        parts.append(".*" if char == "*" else "." if char == "?" else re.escape(char))
+        index += 1
+    return re.compile("".join(parts), re.IGNORECASE | re.DOTALL)
+
+
+def make_criteria(criteria: Any) -> Callable[[Any], bool]:
+    """SUMIF/SUMIFS 条件: ">0"、"<>x"、"SplitBreast"、数字、通配符 * ? ~"""
+    if isinstance(criteria, ExcelError):
+        return lambda value: False
+    if not isinstance(criteria, str):
+        target = 0 if criteria is None else criteria
+        return lambda value: (
+            (is_number(value) and is_number(target) and value == target)
+            or (isinstance(value, bool) and isinstance(target, bool) and value == target)
+        )
+
+    op, operand = "=", criteria
+    for candidate in ("<=", ">=", "<>", "<", ">", "="):
+        if criteria.startswith(candidate):
+            op, operand = candidate, criteria[len(candidate):]
+            break
+    check = COMPARISONS[op]
+
+    number = _parse_number(operand) if operand.strip() else None
+    if number is not None:
+        def match_number(value):
+            if isinstance(value, str):
+                value = _parse_number(value)
+            if not is_number(value):
+                return op == "<>"
+            return check((value > number) - (value < number))
+        return match_number
+
+    if operand.upper() in ("TRUE", "FALSE"):
+        flag = operand.upper() == "TRUE"
+        return lambda value: isinstance(value, bool) and check(compare(value, flag))
+
+    if op in ("=", "<>"):
+        if operand == "":
+            blank = lambda value: value is None or value == ""
+            return blank if op == "=" else (lambda value: not blank(value))
+        pattern = _wildcard_pattern(operand)
+        matches = lambda value: isinstance(value, str) and pattern.fullmatch(value) is not None
+        return matches if op == "=" else (lambda value: not matches(value))
+
+    return lambda value: isinstance(value, str) and check(compare(value, operand))
+
+
+def _roundup(number: float, digits: int) -> float:
+    quantum = Decimal(1).scaleb(-digits)
+    return float(Decimal(repr(number)).quantize(quantum, rounding=ROUND_UP))
+
+
+def _lookup_key(value: Any):
+    """XLOOKUP 精确匹配的归一化键: 数字按值，文本不区分大小写"""
+    if isinstance(value, bool):
+        return ("b", value)
+    if is_number(value):
+        return ("n", float(value))
+    if isinstance(value, str):
+        return ("s", value.lower())
+    return ("e", None)
+
+
+# 由 FormulaEngine 填充: 名称 -> 方法名
+FUNCTIONS: Dict[str, str] = {
+    "SUM": "fn_sum",
+    "MAX": "fn_max",
+    "AVERAGE": "fn_average",
+    "AND": "fn_and",
+    "ISNUMBER": "fn_isnumber",
+    "ROUNDUP": "fn_roundup",
+    "SUMIF": "fn_sumif",
+    "SUMIFS": "fn_sumifs",
+    "SUMPRODUCT": "fn_sumproduct",
+    "XLOOKUP": "fn_xlookup",
+    "INDEX": "fn_index",
+    "MATCH": "fn_match",
+    "SINGLE": "fn_single",
+}
+# 参数按需求值的函数 (未选中的分支不计算)
+LAZY_FUNCTIONS: Dict[str, str] = {
+    "IF": "fn_if",
+    "IFERROR": "fn_iferror",
+    "IFNA": "fn_ifna",
+}
+
+
+# ============================================================================
+# 引擎
+# ============================================================================
+
+@dataclass
+class _Context:
+    sheet: str
+    row: int
+    col: int
+    array: bool = False
+
+
+class FormulaEngine:
+    """按需、带依赖图与区域缓存的公式计算"""
+
+    def __init__(self, reader: WorkbookCellReader):
+        self.reader = reader
+        self._sheet_names = {name.casefold(): name for name in reader.sheetnames}
+        self._cells: Dict[str, Dict[Tuple[int, int], CellReading]] = {}
+        self._bounds: Dict[str, Tuple[int, int]] = {}
+        self._parsed: Dict[str, ParsedFormula] = {}
+
+        self._values: Dict[CellKey, Any] = {}
+        self._evaluating: Set[CellKey] = set()
+        self._ranges: Dict[Area, List[List[Any]]] = {}
+        self._lookup_indexes: Dict[Tuple[Area, int], Dict[Any, int]] = {}
+
+        # 依赖图: 被引用的单元格/区域 -> 引用它的公式单元格
+        self._cell_dependents: Dict[CellKey, Set[CellKey]] = {}
+        self._area_dependents: Dict[Tuple, Set[CellKey]] = {}
+
+        self.evaluated = 0
+        self.unsupported: Dict[CellKey, str] = {}
+
+    # ------------------------------------------------------------------
+    # 工作表
+    # ------------------------------------------------------------------
+
+    def _resolve_sheet(self, name: str) -> Optional[str]:
+        return self._sheet_names.get(name.casefold())
+
+    def _sheet(self, sheet: str) -> Dict[Tuple[int, int], CellReading]:
+        if sheet not in self._cells:
+            cells = {}
+            max_row = max_col = 0
+            for row_number, row in enumerate(self.reader.iter_rows(sheet), start=1):
+                for col_number, reading in enumerate(row, start=1):
+                    if reading is not None and (reading.value is not None or reading.formula):
+                        cells[(row_number, col_number)] = reading
+                        max_row = max(max_row, row_number)
+                        max_col = max(max_col, col_number)
+            self._cells[sheet] = cells
+            self._bounds[sheet] = (max_row, max_col)
+        return self._cells[sheet]
+
+    def _area(self, ref: Ref, context: _Context):
+        sheet = context.sheet if ref.sheet is None else self._resolve_sheet(ref.sheet)
+        if sheet is None:
+            return REF
+        self._sheet(sheet)
+        max_row, max_col = self._bounds[sheet]
+        area = Area(
+            sheet,
+            ref.min_row or 1,
+            ref.min_col or 1,
+            ref.max_row if ref.max_row is not None else max(max_row, ref.min_row or 1),
+            ref.max_col if ref.max_col is not None else max(max_col, ref.min_col or 1),
+        )
+        return self._intersect(area, context) if ref.intersect else area
+
+    # ------------------------------------------------------------------
+    # 取值
+    # ------------------------------------------------------------------
+
+    def value(self, sheet: str, coordinate: str) -> Any:
+        """单元格的计算结果 (公式按需计算并缓存)"""
+        resolved = self._resolve_sheet(sheet)
+        if resolved is None:
+            raise KeyError(f"Worksheet {sheet} does not exist.")
+        row, col = coordinate_to_tuple(coordinate)
+        return self._cell_value(resolved, row, col)
+
+    def values(self, sheet: str, coordinates) -> Dict[str, Any]:
+        return {coordinate: self.value(sheet, coordinate) for coordinate in coordinates}
+
+    def _cell_value(self, sheet: str, row: int, col: int) -> Any:
+        key = (sheet, row, col)
+        if key in self._values:
+            return self._values[key]
+        reading = self._sheet(sheet).get((row, col))
+        if reading is None or reading.formula is None:
+            return _from_cell(reading, self.reader.epoch)
+        if key in self._evaluating:
+            return CIRCULAR
+
+        self._evaluating.add(key)
+        try:
+            result = self._evaluate_cell(key, reading)
+        finally:
+            self._evaluating.discard(key)
+        self._values[key] = result
+        self.evaluated += 1
+        return result
+
+    def _evaluate_cell(self, key: CellKey, reading: CellReading) -> Any:
+        sheet, row, col = key
+        try:
+            parsed = self._parse(reading.formula)
+        except UnsupportedFormula as exc:
+            # 回退到 Excel 缓存值；没有缓存值时为 #NAME?
+            self.unsupported[key] = str(exc)
+            cached = _from_cell(reading, self.reader.epoch)
+            return NAME if cached is None else cached
+
+        self._register(key, parsed.refs)
+        context = _Context(sheet, row, col)
+        result = self._scalar(self._evaluate(parsed.node, context), context)
+        # Excel 中引用空单元格的公式显示 0
+        return 0 if result is None else result
+
+    def _parse(self, formula: str) -> ParsedFormula:
+        parsed = self._parsed.get(formula)
+        if parsed is None:
+            parsed = self._parsed[formula] = parse_formula(formula)
+        return parsed
+
+    def _register(self, key: CellKey, refs: Tuple[Ref, ...]) -> None:
+        for ref in refs:
+            sheet = key[0] if ref.sheet is None else self._resolve_sheet(ref.sheet)
+            if sheet is None:
+                continue
+            if ref.min_row is not None and ref.min_row == ref.max_row and ref.min_col == ref.max_col:
+                self._cell_dependents.setdefault((sheet, ref.min_row, ref.min_col), set()).add(key)
+            else:
+                bounds = (sheet, ref.min_row, ref.min_col, ref.max_row, ref.max_col)
+                self._area_dependents.setdefault(bounds, set()).add(key)
+
+    def area_values(self, area: Area) -> List[List[Any]]:
+        """区域内各单元格的计算结果 (按行)，结果缓存到区域内任一单元格失效为止"""
+        values = self._ranges.get(area)
+        if values is None:
+            values = [
+                [self._cell_value(area.sheet, row, col) for col in range(area.min_col, area.max_col + 1)]
+                for row in range(area.min_row, area.max_row + 1)
+            ]
+            self._ranges[area] = values
+        return values
+
+    # ------------------------------------------------------------------
+    # 增量重算
+    # ------------------------------------------------------------------
+
+    def set_value(self, sheet: str, coordinate: str, value: Any) -> None:
+        """修改输入单元格 (覆盖公式)，依赖它的公式在下次取值时重算"""
+        resolved = self._resolve_sheet(sheet)
+        if resolved is None:
+            raise KeyError(f"Worksheet {sheet} does not exist.")
+        row, col = coordinate_to_tuple(coordinate)
+        cells = self._sheet(resolved)
+        cells[(row, col)] = CellReading(coordinate, value)
+        max_row, max_col = self._bounds[resolved]
+        self._bounds[resolved] = (max(max_row, row), max(max_col, col))
+        self._invalidate((resolved, row, col))
+
+    def _invalidate(self, key: CellKey) -> None:
+        pending = [key]
+        while pending:
+            sheet, row, col = current = pending.pop()
+            self._values.pop(current, None)
+
+            for area in [area for area in self._ranges if area.sheet == sheet and area.contains(row, col)]:
+                del self._ranges[area]
+                for mode in (1, -1):
+                    self._lookup_indexes.pop((area, mode), None)
+
+            dependents = set(self._cell_dependents.get(current, ()))
+            for (area_sheet, min_row, min_col, max_row, max_col), keys in self._area_dependents.items():
+                if (
+                    area_sheet == sheet
+                    and (min_row is None or min_row <= row)
+                    and (max_row is None or row <= max_row)
+                    and (min_col is None or min_col <= col)
+                    and (max_col is None or col <= max_col)
+                ):
+                    dependents |= keys
+            # 未缓存的依赖单元格下次取值时本来就会重算
+            pending.extend(dependent for dependent in dependents if dependent in self._values)
+
+    # ------------------------------------------------------------------
+    # 求值
+    # ------------------------------------------------------------------
+
+    def _evaluate(self, node, context: _Context):
+        if isinstance(node, Literal):
+            return node.value
+        if isinstance(node, Ref):
+            return self._area(node, context)
+        if isinstance(node, Missing):
+            return None
+        if isinstance(node, Unary):
+            operand = self._operand(self._evaluate(node.operand, context), context)
+            if node.op == "+":
+                return operand
+            return self._elementwise(lambda value: _arithmetic("-", 0, value), operand)
+        if isinstance(node, Binary):
+            left = self._operand(self._evaluate(node.left, context), context)
+            right = self._operand(self._evaluate(node.right, context), context)
+            return self._broadcast(lambda a, b: apply_operator(node.op, a, b), left, right)
+        if isinstance(node, Call):
+            if node.name in LAZY_FUNCTIONS:
+                return getattr(self, LAZY_FUNCTIONS[node.name])(node.args, context)
+            if node.name == "SUMPRODUCT":
+                context = _Context(context.sheet, context.row, context.col, array=True)
+            args = [self._evaluate(arg, context) for arg in node.args]
+            return getattr(self, FUNCTIONS[node.name])(args, context)
+        raise UnsupportedFormula(f"未知节点: {node!r}")
+
+    def _intersect(self, area: Area, context: _Context):
+        """隐式交集: 多单元格区域取与公式所在行/列相交的单元格"""
+        if area.shape == (1, 1):
+            return self._cell_value(area.sheet, area.min_row, area.min_col)
+        if area.min_col == area.max_col and area.min_row <= context.row <= area.max_row:
+            return self._cell_value(area.sheet, context.row, area.min_col)
+        if area.min_row == area.max_row and area.min_col <= context.col <= area.max_col:
+            return self._cell_value(area.sheet, area.min_row, context.col)
+        return VALUE
+
+    def _operand(self, value, context: _Context):
+        """运算符的操作数: 数组上下文中区域展开为二维列表，否则取隐式交集"""
+        if isinstance(value, Area):
+            if context.array and value.shape != (1, 1):
+                return self.area_values(value)
+            return self._intersect(value, context)
+        return value
+
+    def _scalar(self, value, context: _Context):
+        if isinstance(value, Area):
+            return self._intersect(value, context)
+        if is_array(value):
+            return value[0][0] if value and value[0] else VALUE
+        return value
+
+    def _to_array(self, value) -> List[List[Any]]:
+        if isinstance(value, Area):
+            return self.area_values(value)
+        if is_array(value):
+            return value
+        return [[value]]
+
+    @staticmethod
+    def _elementwise(func, value):
+        if is_array(value):
+            return [[func(item) for item in row] for row in value]
+        return func(value)
+
+    @staticmethod
+    def _broadcast(func, left, right):
+        if not is_array(left) and not is_array(right):
+            return func(left, right)
+        left_rows = left if is_array(left) else None
+        right_rows = right if is_array(right) else None
+        if left_rows is not None and right_rows is not None:
+            if len(left_rows) != len(right_rows) or len(left_rows[0]) != len(right_rows[0]):
+                return VALUE
+            return [[func(a, b) for a, b in zip(lrow, rrow)] for lrow, rrow in zip(left_rows, right_rows)]
+        if left_rows is not None:
+            return [[func(a, right) for a in row] for row in left_rows]
+        return [[func(left, b) for b in row] for row in right_rows]
+
+    def _iter_arguments(self, args):
+        """聚合函数的参数值: (值, 是否来自引用/数组)"""
+        for arg in args:
+            if isinstance(arg, Area) or is_array(arg):
+                for row in self._to_array(arg):
+                    for value in row:
+                        yield value, True
+            else:
+                yield arg, False
+
+    def _numbers(self, args):
+        """SUM/MAX/AVERAGE: 引用中只取数字；直接参数按算术规则转换"""
+        numbers = []
+        for value, from_reference in self._iter_arguments(args):
+            if isinstance(value, ExcelError):
+                return value
+            if from_reference:
+                if is_number(value):
+                    numbers.append(value)
+            else:
+                number = to_number(value)
+                if isinstance(number, ExcelError):
+                    return number
+                numbers.append(number)
+        return numbers
+
+    # ------------------------------------------------------------------
+    # 函数实现
+    # ------------------------------------------------------------------
+
+    def fn_sum(self, args, context):
+        numbers = self._numbers(args)
+        return numbers if isinstance(numbers, ExcelError) else sum(numbers)
+
+    def fn_max(self, args, context):
+        numbers = self._numbers(args)
+        if isinstance(numbers, ExcelError):
+            return numbers
+        return max(numbers) if numbers else 0
+
+    def fn_average(self, args, context):
+        numbers = self._numbers(args)
+        if isinstance(numbers, ExcelError):
+            return numbers
+        return sum(numbers) / len(numbers) if numbers else DIV0
+
+    def fn_and(self, args, context):
+        flags = []
+        for value, from_reference in self._iter_arguments(args):
+            if isinstance(value, ExcelError):
+                return value
+            if from_reference and not (is_number(value) or isinstance(value, bool)):
+                continue
+            flag = to_bool(value)
+            if isinstance(flag, ExcelError):
+                return flag
+            flags.append(flag)
+        return all(flags) if flags else VALUE
+
+    def fn_isnumber(self, args, context):
+        if len(args) != 1:
+            return VALUE
+        return is_number(self._scalar(args[0], context))
+
+    def fn_single(self, args, context):
+        return self._scalar(args[0], context) if len(args) == 1 else VALUE
+
+    def fn_roundup(self, args, context):
+        if len(args) != 2:
+            return VALUE
+        number = to_number(self._scalar(args[0], context))
+        digits = to_number(self._scalar(args[1], context))
+        error = _first_error((number, digits))
+        if error is not None:
+            return error
+        return _roundup(number, int(digits))
+
+    def _conditional_sum(self, sum_area, conditions):
+        """SUMIF/SUMIFS: conditions 为 [(条件区域, 条件值)]，求和区域按第一个条件区域的形状对齐"""
+        error = _first_error([sum_area] + [area for area, _ in conditions])
+        if error is not None:
+            return error
+        if not all(isinstance(area, Area) for area, _ in conditions) or not isinstance(sum_area, Area):
+            return VALUE
+        rows, cols = conditions[0][0].shape
+        if any(area.shape != (rows, cols) for area, _ in conditions[1:]):
+            return VALUE
+
+        matches = None
+        for area, criteria in conditions:
+            matcher = make_criteria(criteria)
+            flags = [matcher(value) for row in self.area_values(area) for value in row]
+            matches = flags if matches is None else [a and b for a, b in zip(matches, flags)]
+
+        sum_area = Area(
+            sum_area.sheet,
+            sum_area.min_row,
+            sum_area.min_col,
+            sum_area.min_row + rows - 1,
+            sum_area.min_col + cols - 1,
+        )
+        total = 0
+        for matched, value in zip(matches, (value for row in self.area_values(sum_area) for value in row)):
+            if not matched:
+                continue
+            if isinstance(value, ExcelError):
+                return value
+            if is_number(value):
+                total += value
+        return total
+
+    def fn_sumif(self, args, context):
+        if len(args) not in (2, 3):
+            return VALUE
+        criteria = self._scalar(args[1], context)
+        sum_area = args[2] if len(args) == 3 and args[2] is not None else args[0]
+        return self._conditional_sum(sum_area, [(args[0], criteria)])
+
+    def fn_sumifs(self, args, context):
+        if len(args) < 3 or len(args) % 2 == 0:
+            return VALUE
+        conditions = [
+            (args[index], self._scalar(args[index + 1], context)) for index in range(1, len(args), 2)
+        ]
+        return self._conditional_sum(args[0], conditions)
+
+    def fn_sumproduct(self, args, context):
+        if not args:
+            return VALUE
+        error = _first_error(args)
+        if error is not None:
+            return error
+        arrays = [self._to_array(arg) for arg in args]
+        shape = (len(arrays[0]), len(arrays[0][0]) if arrays[0] else 0)
+        if any((len(array), len(array[0]) if array else 0) != shape for array in arrays):
+            return VALUE
+        total = 0
+        for items in zip(*(iter_flat(array) for array in arrays)):
+            error = _first_error(items)
+            if error is not None:
+                return error
+            product = 1
+            for item in items:
+                product *= item if is_number(item) else 0
+            total += product
+        return total
+
+    def _lookup_index(self, area: Area, search_mode: int) -> Dict[Any, int]:
+        """精确匹配索引: 归一化键 -> 第一个 (search_mode=-1 时最后一个) 匹配位置"""
+        index = self._lookup_indexes.get((area, search_mode))
+        if index is None:
+            index = {}
+            for position, value in enumerate(iter_flat(self.area_values(area))):
+                key = _lookup_key(value)
+                if search_mode < 0 or key not in index:
+                    index[key] = position
+            self._lookup_indexes[(area, search_mode)] = index
+        return index
+
+    def fn_xlookup(self, args, context):
+        if not 3 <= len(args) <= 6:
+            return VALUE
+        lookup = self._scalar(args[0], context)
+        if isinstance(lookup, ExcelError):
+            return lookup
+        lookup_array, return_array = args[1], args[2]
+        if_not_found = args[3] if len(args) > 3 and args[3] is not None else NA
+        match_mode = to_number(self._scalar(args[4], context)) if len(args) > 4 and args[4] is not None else 0
+        search_mode = to_number(self._scalar(args[5], context)) if len(args) > 5 and args[5] is not None else 1
+        if _first_error((match_mode, search_mode)) is not None:
+            return VALUE
+        search_mode = -1 if search_mode in (-1, -2) else 1
+
+        # 查找区域为一列时按行返回，为一行时按列返回；返回区域长度必须与查找区域一致
+        lookup_rows = self._to_array(lookup_array)
+        rows = self._to_array(return_array)
+        vertical = len(lookup_rows) > 1 or len(lookup_rows[0]) == 1
+        if (len(rows) if vertical else len(rows[0])) != (len(lookup_rows) if vertical else len(lookup_rows[0])):
+            return VALUE
+
+        if match_mode == 0 and isinstance(lookup_array, Area):
+            position = self._lookup_index(lookup_array, search_mode).get(_lookup_key(lookup))
+        else:
+            position = _scan_lookup(lookup, list(iter_flat(lookup_rows)), int(match_mode), search_mode)
+        if position is None:
+            return self._scalar(if_not_found, context)
+
+        if vertical:
+            return rows[position][0] if len(rows[position]) == 1 else [rows[position]]
+        return rows[0][position] if len(rows) == 1 else [[row[position]] for row in rows]
+
+    def fn_match(self, args, context):
+        """MATCH: 0 精确 (文本可含通配符)、1 不大于查找值的最大值、-1 不小于查找值的最小值"""
+        if len(args) not in (2, 3):
+            return VALUE
+        lookup = self._scalar(args[0], context)
+        if isinstance(lookup, ExcelError):
+            return lookup
+        match_type = to_number(self._scalar(args[2], context)) if len(args) == 3 and args[2] is not None else 1
+        if isinstance(match_type, ExcelError):
+            return match_type
+
+        lookup_array = args[1]
+        rows = self._to_array(lookup_array)
+        if len(rows) > 1 and len(rows[0]) > 1:
+            return NA
+        if match_type == 0:
+            if isinstance(lookup, str) and any(char in lookup for char in "*?~"):
+                position = _scan_lookup(lookup, list(iter_flat(rows)), 2, 1)
+            elif isinstance(lookup_array, Area):
+                position = self._lookup_index(lookup_array, 1).get(_lookup_key(lookup))
+            else:
+                position = _scan_lookup(lookup, list(iter_flat(rows)), 0, 1)
+        else:
+            # 按 Excel 的约定查找区域已排序，线性查找与二分查找结果一致
+            position = _scan_lookup(lookup, list(iter_flat(rows)), -1 if match_type > 0 else 1, 1)
+        return NA if position is None else position + 1
+
+    def fn_index(self, args, context):
+        """INDEX(区域, 行号[, 列号])；行号或列号为 0 时返回整列或整行，结果为引用"""
+        if len(args) not in (2, 3):
+            return VALUE
+        error = _first_error([args[0]])
+        if error is not None:
+            return error
+        numbers = [
+            to_number(self._scalar(arg, context)) if arg is not None else 0 for arg in args[1:]
+        ]
+        error = _first_error(numbers)
+        if error is not None:
+            return error
+        row_number, col_number = (int(number) for number in (numbers + [0])[:2])
+
+        source = args[0]
+        array = None if isinstance(source, Area) else self._to_array(source)
+        rows, cols = source.shape if array is None else (len(array), len(array[0]))
+        # 单行区域只给一个序号时按列取
+        if len(args) == 2 and rows == 1:
+            row_number, col_number = 1, row_number
+        if not (0 <= row_number <= rows and 0 <= col_number <= cols):
+            return REF
+
+        if array is None:
+            min_row = source.min_row + row_number - 1 if row_number else source.min_row
+            max_row = min_row if row_number else source.max_row
+            min_col = source.min_col + col_number - 1 if col_number else source.min_col
+            max_col = min_col if col_number else source.max_col
+            return Area(source.sheet, min_row, min_col, max_row, max_col)
+
+        selected = [array[row_number - 1]] if row_number else array
+        if col_number:
+            selected = [[row[col_number - 1]] for row in selected]
+        return selected[0][0] if len(selected) == 1 and len(selected[0]) == 1 else selected
+
+    def fn_if(self, arg_nodes, context):
+        if len(arg_nodes) not in (2, 3):
+            return VALUE
+
+        def branch(index):
+            # IF(c, a) 条件不成立时为 FALSE；显式省略的分支 IF(c, a, ) 为 0
+            if index >= len(arg_nodes):
+                return False
+            node = arg_nodes[index]
+            return 0 if isinstance(node, Missing) else self._evaluate(node, context)
+
+        condition = self._operand(self._evaluate(arg_nodes[0], context), context)
+        if is_array(condition):
+            when_true = self._operand(branch(1), context)
+            when_false = self._operand(branch(2), context)
+            return [
+                [_pick(to_bool(flag), when_true, when_false, r, c) for c, flag in enumerate(row)]
+                for r, row in enumerate(condition)
+            ]
+        flag = to_bool(condition)
+        if isinstance(flag, ExcelError):
+            return flag
+        return branch(1) if flag else branch(2)
+
+    def fn_iferror(self, arg_nodes, context):
+        return self._if_error(arg_nodes, context, lambda value: isinstance(value, ExcelError))
+
+    def fn_ifna(self, arg_nodes, context):
+        return self._if_error(arg_nodes, context, lambda value: value == NA)
+
+    def _if_error(self, arg_nodes, context, caught):
+        if len(arg_nodes) != 2:
+            return VALUE
+        value = self._operand(self._evaluate(arg_nodes[0], context), context)
+        if is_array(value):
+            fallback = self._operand(self._evaluate(arg_nodes[1], context), context)
+            return [
+                [_pick(not caught(item), item, fallback, r, c) for c, item in enumerate(row)]
+                for r, row in enumerate(value)
+            ]
+        if caught(value):
+            return self._evaluate(arg_nodes[1], context)
+        return value
+
+
+def iter_flat(rows):
+    for row in rows:
+        yield from row
+
+
+def _pick(flag, when_true, when_false, row: int, col: int):
+    if isinstance(flag, ExcelError):
+        return flag
+    chosen = when_true if flag else when_false
+    if is_array(chosen):
+        try:
+            return chosen[row][col]
+        except IndexError:
+            return NA
+    return chosen
+
+
+def _scan_lookup(lookup, values, match_mode: int, search_mode: int) -> Optional[int]:
+    """XLOOKUP 线性查找: 0 精确、-1 精确或下一个较小、1 精确或下一个较大、2 通配符"""
+    positions = range(len(values)) if search_mode > 0 else range(len(values) - 1, -1, -1)
+    if match_mode == 2 and isinstance(lookup, str):
+        pattern = _wildcard_pattern(lookup)
+        return next(
+            (p for p in positions if isinstance(values[p], str) and pattern.fullmatch(values[p])), None
+        )
+
+    best = None
+    for position in positions:
+        value = values[position]
+        if value is None or isinstance(value, ExcelError) or _type_rank(value) != _type_rank(lookup):
+            continue
+        order = compare(value, lookup)
+        if order == 0:
+            return position
+        if match_mode == -1 and order < 0 and (best is None or compare(value, values[best]) > 0):
+            best = position
+        elif match_mode == 1 and order > 0 and (best is None or compare(value, values[best]) < 0):
+            best = position
+    return best if match_mode in (-1, 1) else None
@@ -0,0 +1,291 @@
+"""
+工作簿快照存储 (按内容寻址)
+
+功能:
+1. 把 xlsx 拆成包内部件，按 SHA-256 去重存放 (objects/)，相同部件只存一份
+2. 每次导出/备份记录为一个清单 (manifests/*.json)，列出部件顺序与哈希
+3. 按快照 ID 还原出完整工作簿
+4. 磁盘占用与耗时只随实际变化的部件增长
+
+目录结构:
+    <root>/objects/ab/abcdef...   zlib 压缩的部件内容
+    <root>/manifests/<id>.json    快照清单
+    <root>/latest/<label>.json    各标签最近一次快照的 ID (避免每次导出扫描全部清单)
+
+用法:
+    python snapshot_store.py snapshot <文件> --label before_fix
+    python snapshot_store.py list [--label before_fix]
+    python snapshot_store.py restore <快照ID> <目标文件>
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+import argparse
+import hashlib
+import json
+import logging
+import os
+import zipfile
+import zlib
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROOT = Path(__file__).resolve().parent.parent / "data" / "snapshots"
+
+# 非 zip 文件整体作为一个部件存放
+RAW_PART = ""
+
+
+@dataclass(frozen=True)
+class SnapshotPart:
+    name: str
+    sha256: str
+    size: int
+    date_time: tuple[int, ...] = (1980, 1, 1, 0, 0, 0)
+    compress_type: int = zipfile.ZIP_DEFLATED
+
+
+@dataclass
+class SnapshotManifest:
+    snapshot_id: str
+    label: str
+    source: str
+    created: str
+    file_sha256: str
+    file_size: int
+    parts: list[SnapshotPart] = field(default_factory=list)
+    new_objects: int = 0
+    new_bytes: int = 0
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SnapshotManifest":
+        parts = [
+            SnapshotPart(**{**part, "date_time": tuple(part["date_time"])})
+            for part in data.get("parts", [])
+        ]
+        return cls(**{**data, "parts": parts})
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def safe_label(label: str) -> str:
+    return "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in label) or "snapshot"
+
+
+class SnapshotStore:
+    """按内容寻址的工作簿快照存储"""
+
+    def __init__(self, root: Path = DEFAULT_ROOT):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.manifests_dir = self.root / "manifests"
+        self.latest_dir = self.root / "latest"
+
+    # ------------------------------------------------------------------
+    # 对象
+    # ------------------------------------------------------------------
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.objects_dir / sha256[:2] / sha256[2:]
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(path.name + ".tmp")
+        temp_path.write_bytes(data)
+        os.replace(temp_path, path)
+
+    def _put_object(self, data: bytes) -> tuple[str, int]:
+        """存入部件内容，返回 (哈希, 新写入的字节数)"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha256)
+        if path.exists():
+            return sha256, 0
+        compressed = zlib.compress(data, 6)
+        self._write_atomic(path, compressed)
+        return sha256, len(compressed)
+
+    def _get_object(self, sha256: str) -> bytes:
+        path = self._object_path(sha256)
+        if not path.exists():
+            raise FileNotFoundError(f"快照对象缺失: {sha256}")
+        data = zlib.decompress(path.read_bytes())
+        if hashlib.sha256(data).hexdigest() != sha256:
+            raise ValueError(f"快照对象已损坏: {sha256}")
+        return data
+
+    # ------------------------------------------------------------------
+    # 清单
+    # ------------------------------------------------------------------
+
+    def _manifest_path(self, snapshot_id: str) -> Path:
+        return self.manifests_dir / f"{snapshot_id}.json"
+
+    def get(self, snapshot_id: str) -> SnapshotManifest:
+        path = self._manifest_path(snapshot_id)
+        if not path.exists():
+            raise FileNotFoundError(f"快照不存在: {snapshot_id}")
+        return SnapshotManifest.from_dict(json.loads(path.read_text(encoding="utf-8")))
+
+    def list_snapshots(self, label: str | None = None) -> list[SnapshotManifest]:
+        """按创建时间排序列出快照"""
+        if not self.manifests_dir.exists():
+            return []
+        manifests = [
+            SnapshotManifest.from_dict(json.loads(path.read_text(encoding="utf-8")))
+            for path in self.manifests_dir.glob("*.json")
+        ]
+        if label is not None:
+            manifests = [manifest for manifest in manifests if manifest.label == safe_label(label)]
+        return sorted(manifests, key=lambda manifest: (manifest.created, manifest.snapshot_id))
+
+    def _latest_path(self, label: str) -> Path:
+        return self.latest_dir / f"{safe_label(label)}.json"
+
+    def _set_latest(self, manifest: SnapshotManifest) -> None:
+        payload = json.dumps({"snapshot_id": manifest.snapshot_id}, ensure_ascii=False)
+        self._write_atomic(self._latest_path(manifest.label), payload.encode("utf-8"))
+
+    def latest(self, label: str | None = None) -> SnapshotManifest | None:
+        """最近一次快照；指定标签时读取该标签的指针文件，指针缺失或失效时回退为扫描清单"""
+        if label is not None:
+            pointer = self._latest_path(label)
+            if pointer.exists():
+                snapshot_id = json.loads(pointer.read_text(encoding="utf-8"))["snapshot_id"]
+                if self._manifest_path(snapshot_id).exists():
+                    return self.get(snapshot_id)
+        manifests = self.list_snapshots(label)
+        if not manifests:
+            return None
+        if label is not None:
+            self._set_latest(manifests[-1])
+        return manifests[-1]
+
+    # ------------------------------------------------------------------
+    # 快照 / 还原
+    # ------------------------------------------------------------------
+
+    def _read_parts(self, source: Path) -> tuple[list[SnapshotPart], int, int]:
+        parts = []
+        new_objects = new_bytes = 0
+        if zipfile.is_zipfile(source):
+            with zipfile.ZipFile(source) as archive:
+                for info in archive.infolist():
+                    sha256, written = self._put_object(archive.read(info))
+                    parts.append(
+                        SnapshotPart(
+                            name=info.filename,
+                            sha256=sha256,
+                            size=info.file_size,
+                            date_time=tuple(info.date_time),
+                            compress_type=info.compress_type,
+                        )
+                    )
+                    new_objects += bool(written)
+                    new_bytes += written
+        else:
+            data = source.read_bytes()
+            sha256, written = self._put_object(data)
+            parts.append(SnapshotPart(name=RAW_PART, sha256=sha256, size=len(data)))
+            new_objects, new_bytes = int(bool(written)), written
+        return parts, new_objects, new_bytes
+
+    def snapshot(self, source: Path, label: str) -> SnapshotManifest:
+        """记录一个快照；文件与同标签最近一次快照相同时直接复用其部件列表"""
+        source = Path(source)
+        label = safe_label(label)
+        file_sha256 = file_digest(source)
+
+        previous = self.latest(label)
+        if previous is not None and previous.file_sha256 == file_sha256:
+            parts, new_objects, new_bytes = previous.parts, 0, 0
+        else:
+            parts, new_objects, new_bytes = self._read_parts(source)
+
+        created = datetime.now()
+        manifest = SnapshotManifest(
+            snapshot_id=f"{label}_{created.strftime('%Y%m%d_%H%M%S')}_{file_sha256[:8]}",
+            label=label,
+            source=str(source),
+            created=created.isoformat(timespec="seconds"),
+            file_sha256=file_sha256,
+            file_size=source.stat().st_size,
+            parts=parts,
+            new_objects=new_objects,
+            new_bytes=new_bytes,
+        )
+        payload = json.dumps(asdict(manifest), ensure_ascii=False, indent=2)
+        self._write_atomic(self._manifest_path(manifest.snapshot_id), payload.encode("utf-8"))
+        self._set_latest(manifest)
+        logger.info(
+            "快照已记录: %s (%d 个部件, 新增 %d 个对象 / %d 字节)",
+            manifest.snapshot_id,
+            len(parts),
+            new_objects,
+            new_bytes,
+        )
+        return manifest
+
+    def restore(self, snapshot_id: str, target: Path) -> Path:
+        """按清单重建工作簿 (部件内容一致；zip 压缩字节可能与原文件不同)"""
+        manifest = self.get(snapshot_id)
+        target = Path(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = target.with_name(target.name + ".tmp")
+
+        if len(manifest.parts) == 1 and manifest.parts[0].name == RAW_PART:
+            temp_path.write_bytes(self._get_object(manifest.parts[0].sha256))
+        else:
+            with zipfile.ZipFile(temp_path, "w") as archive:
+                for part in manifest.parts:
+                    info = zipfile.ZipInfo(part.name, date_time=part.date_time)
+                    info.compress_type = part.compress_type
+                    archive.writestr(info, self._get_object(part.sha256))
+
+        os.replace(temp_path, target)
+        logger.info("快照已还原: %s -> %s", snapshot_id, target)
+        return target
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="工作簿快照存储")
+    parser.add_argument("--root", type=Path, default=DEFAULT_ROOT, help="快照存储目录")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = commands.add_parser("snapshot", help="记录快照")
+    snapshot_parser.add_argument("files", type=Path, nargs="+")
+    snapshot_parser.add_argument("--label", default=None, help="快照标签 (默认取文件名)")
+
+    list_parser = commands.add_parser("list", help="列出快照")
+    list_parser.add_argument("--label", default=None)
+
+    restore_parser = commands.add_parser("restore", help="还原快照")
+    restore_parser.add_argument("snapshot_id")
+    restore_parser.add_argument("target", type=Path)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    store = SnapshotStore(args.root)
+
+    if args.command == "snapshot":
+        for path in args.files:
+            store.snapshot(path, args.label or path.stem)
+    elif args.command == "list":
+        for manifest in store.list_snapshots(args.label):
+            print(f"{manifest.snapshot_id}  {manifest.created}  {manifest.file_size:>9} 字节  {manifest.source}")
+    else:
+        store.restore(args.snapshot_id, args.target)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,17 +2,49 @@
 
 按顺序执行：LoadInputs -> AssignStations -> InsertBreaks -> ValidateOverlaps -> ExportMaster。
 每一步使用结构化参数并返回统一的 Result。
+各步骤之间共享 RowStore (只记录新增字段)，ExportMaster 再转换为普通字典列表返回。
+指定 checkpoint_dir 时，checkpoint_steps 中步骤的输出 (InputBundle、StationAssignment、BreakPlan)
+按输入行内容与步骤参数的哈希保存为检查点，重跑时从第一个输入变化的步骤开始执行。
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Any, Dict, Generic, Iterable, List, Optional, TypeVar
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime, time, timedelta
+from pathlib import Path
+from time import perf_counter
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
+import hashlib
+import heapq
+import logging
+import os
+import pickle
+import re
+import sys
+import threading
 
 
 T = TypeVar("T")
 
+MINUTES_PER_DAY = 24 * 60
+MICROSECONDS_PER_DAY = 86_400_000_000
+MICROSECONDS_PER_MINUTE = 60_000_000
+TIME_PATTERN = re.compile(r"(\d{1,2}):(\d{2})(?::(\d{2}))?")
+
 
 @dataclass
 class Result(Generic[T]):
@@ -30,19 +62,208 @@ class Result(Generic[T]):
         return Result(success=False, message=message, errors=list(errors or []))
 
 
+@dataclass
+class LogRecord:
+    created: datetime
+    department: str
+    step: str
+    status: str
+    message: str
+    elapsed: Optional[float] = None  # 秒
+    rows: Optional[int] = None
+
+    def as_row(self, timestamp: str) -> List[Any]:
+        elapsed_ms = None if self.elapsed is None else round(self.elapsed * 1000, 1)
+        return [timestamp, self.department, self.step, self.status, self.message, elapsed_ms, self.rows]
+
+    def as_line(self, timestamp: str) -> str:
+        line = f"[{timestamp}] [{self.department}] {self.step} - {self.status}: {self.message}"
+        details = []
+        if self.elapsed is not None:
+            details.append(f"{self.elapsed * 1000:.1f} ms")
+        if self.rows is not None:
+            details.append(f"{self.rows} 行")
+        return f"{line} ({', '.join(details)})" if details else line
+
+
 @dataclass
 class ScheduleLogger:
-    """可选日志写入器（支持 Log Sheet 或其他目标）。"""
+    """可选日志写入器（支持 Log Sheet、日志文件或控制台）。
+
+    记录先缓存在内存中，累计 buffer_size 条或调用 flush() 时一次性写出；
+    每条记录可附带该部门该步骤的耗时与行数。
+    """
 
     log_sheet: Optional[Any] = None
+    log_file: Optional[Path] = None
+    buffer_size: int = 1000
+    _pending: List[LogRecord] = field(default_factory=list, repr=False, compare=False)
+    # 同一日志器可能被多个线程共用
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def log(
+        self,
+        department: str,
+        step: str,
+        status: str,
+        message: str,
+        elapsed: Optional[float] = None,
+        rows: Optional[int] = None,
+    ) -> None:
+        record = LogRecord(datetime.now(), department, step, status, message, elapsed, rows)
+        with self._lock:
+            self._pending.append(record)
+            if len(self._pending) >= self.buffer_size:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def drain(self) -> List[LogRecord]:
+        """取出尚未写出的记录 (子进程中收集，交回主进程写出)。"""
+        with self._lock:
+            records, self._pending = self._pending, []
+        return records
+
+    def extend(self, records: Iterable[LogRecord]) -> None:
+        with self._lock:
+            self._pending.extend(records)
+            if len(self._pending) >= self.buffer_size:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        records, self._pending = self._pending, []
+
+        # 同一秒内的记录复用格式化后的时间戳
+        stamps: Dict[int, str] = {}
+
+        def timestamp(record: LogRecord) -> str:
+            second = int(record.created.timestamp())
+            if second not in stamps:
+                stamps[second] = record.created.strftime("%Y-%m-%d %H:%M:%S")
+            return stamps[second]
 
-    def log(self, department: str, step: str, status: str, message: str) -> None:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         if self.log_sheet is not None and hasattr(self.log_sheet, "append"):
-            self.log_sheet.append([timestamp, department, step, status, message])
+            for record in records:
+                self.log_sheet.append(record.as_row(timestamp(record)))
+        elif self.log_file is not None:
+            path = Path(self.log_file)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a", encoding="utf-8") as handle:
+                handle.write("".join(record.as_line(timestamp(record)) + "\n" for record in records))
         else:
-            # 退化为内存或控制台日志
-            print(f"[{timestamp}] [{department}] {step} - {status}: {message}")
+            # 退化为控制台日志
+            print("\n".join(record.as_line(timestamp(record)) for record in records))
+
+
+def default_logger() -> ScheduleLogger:
+    """单独调用某个步骤且未传入日志器时使用：逐条写出，不需要再 flush。"""
+    return ScheduleLogger(buffer_size=1)
+
+
+class RowView(Mapping):
+    """RowStore 中一行的只读视图：先查列覆盖层，再查基础行。"""
+
+    __slots__ = ("_store", "_index")
+
+    def __init__(self, store: "RowStore", index: int):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, key: str) -> Any:
+        store = self._store
+        overlay = store.overlays.get(key)
+        if overlay is not None and self._index in overlay:
+            return overlay[self._index]
+        base = store.base[self._index]
+        if key in base:
+            return base[key]
+        return store.defaults[key]
+
+    def __iter__(self) -> Iterator[str]:
+        store = self._store
+        base = store.base[self._index]
+        yield from base
+        for key, overlay in store.overlays.items():
+            if self._index in overlay and key not in base:
+                yield key
+        for key in store.defaults:
+            if key not in base and self._index not in store.overlays.get(key, ()):
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"RowView({dict(self)!r})"
+
+
+class RowStore(Sequence):
+    """部门行存储。
+
+    基础行在各阶段间共享且不被修改；阶段新增的字段记录为列覆盖层 (行号 -> 值 的稀疏字典)，
+    或记录为列默认值 (行中没有该字段时取用，不占逐行内存)。
+    with_column / with_default 返回共享基础行和已有覆盖层的新存储，整行字典不会被复制。
+    """
+
+    __slots__ = ("base", "overlays", "defaults")
+
+    def __init__(
+        self,
+        base: Sequence[Mapping[str, Any]],
+        overlays: Optional[Dict[str, Dict[int, Any]]] = None,
+        defaults: Optional[Dict[str, Any]] = None,
+    ):
+        self.base = base
+        self.overlays: Dict[str, Dict[int, Any]] = overlays or {}
+        self.defaults: Dict[str, Any] = defaults or {}
+
+    def __len__(self) -> int:
+        return len(self.base)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [RowView(self, position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return RowView(self, index)
+
+    def has_field(self, index: int, key: str) -> bool:
+        if key in self.defaults:
+            return True
+        overlay = self.overlays.get(key)
+        return (overlay is not None and index in overlay) or key in self.base[index]
+
+    def missing(self, key: str) -> Iterator[int]:
+        """没有该字段的行号。"""
+        return (index for index in range(len(self)) if not self.has_field(index, key))
+
+    def with_column(self, key: str, values: Dict[int, Any]) -> "RowStore":
+        """新增或覆盖一列 (仅 values 中的行)，不修改当前存储。"""
+        merged = {**self.overlays[key], **values} if key in self.overlays else values
+        return RowStore(self.base, {**self.overlays, key: merged}, self.defaults)
+
+    def with_default(self, key: str, value: Any) -> "RowStore":
+        """对没有该字段的行提供默认值 (效果同 setdefault)；所有行共享同一对象，应使用不可变值。"""
+        if key in self.defaults:
+            return self
+        return RowStore(self.base, self.overlays, {**self.defaults, key: value})
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """需要普通字典时再物化 (会复制整行)。"""
+        return [dict(row) for row in self]
+
+
+Rows = Union[RowStore, Sequence[Mapping[str, Any]]]
+
+
+def as_row_store(rows: Rows) -> RowStore:
+    return rows if isinstance(rows, RowStore) else RowStore(rows)
 
 
 @dataclass
@@ -52,7 +273,7 @@ class LoadInputsParams:
 
 @dataclass
 class InputBundle:
-    departments: Dict[str, List[Dict[str, Any]]]
+    departments: Dict[str, RowStore]
 
 
 @dataclass
@@ -62,7 +283,7 @@ class AssignStationsParams:
 
 @dataclass
 class StationAssignment:
-    departments: Dict[str, List[Dict[str, Any]]]
+    departments: Dict[str, RowStore]
 
 
 @dataclass
@@ -71,14 +292,48 @@ class InsertBreaksParams:
     break_rules: Dict[str, Any] = field(default_factory=dict)
 
 
+@dataclass(frozen=True)
+class ScheduleConflict:
+    """校验发现的问题；positions 为部门内的行号 (从 0 开始)，start/end 为分钟数。"""
+
+    department: str
+    kind: str
+    subject: Any
+    start: int
+    end: int
+    positions: Tuple[int, ...]
+
+    def describe(self) -> str:
+        label = CONFLICT_LABELS.get(self.kind, self.kind)
+        rows = ", ".join(str(position) for position in self.positions)
+        if self.kind == "invalid_time":
+            return f"{self.department} {label}: {self.subject} (行 {rows})"
+        return (
+            f"{self.department} {label}: {self.subject} "
+            f"{format_minute(self.start)}-{format_minute(self.end)} (行 {rows})"
+        )
+
+
+CONFLICT_LABELS = {
+    "shift_overlap": "班次重叠",
+    "break_overlap": "休息重叠",
+    "coverage_gap": "工位无人覆盖",
+    "invalid_time": "时间无法解析",
+}
+
+
 @dataclass
 class BreakPlan:
-    schedule: Dict[str, List[Dict[str, Any]]]
+    schedule: Dict[str, RowStore]
+    conflicts: List[ScheduleConflict] = field(default_factory=list)
 
 
 @dataclass
 class ValidateOverlapsParams:
     break_plan: BreakPlan
+    check_coverage: bool = True
+    # 工位覆盖缺口默认只记录警告，为 True 时视为校验失败
+    coverage_gap_is_error: bool = False
 
 
 @dataclass
@@ -93,6 +348,284 @@ class RunScheduleParams:
     break_rules: Dict[str, Any] = field(default_factory=dict)
     output_options: Dict[str, Any] = field(default_factory=dict)
     log_sheet: Optional[Any] = None
+    log_file: Optional[Path] = None
+    # 大于 1 时各部门在进程池中独立走完 LoadInputs -> ValidateOverlaps，在 ExportMaster 汇合
+    workers: int = 1
+    # 检查点目录；为 None 时不保存也不恢复
+    checkpoint_dir: Optional[Path] = None
+    # 保存检查点的步骤；InsertBreaks 的键含休息规则，调整规则重跑时仍从 AssignStations 的检查点恢复
+    checkpoint_steps: Tuple[str, ...] = ("LoadInputs", "AssignStations", "InsertBreaks")
+
+
+# ============================================================================
+# 检查点
+# ============================================================================
+
+# 步骤逻辑或键的算法变化时递增，使旧检查点失效
+CHECKPOINT_VERSION = 3
+
+
+def checkpoint_key(*parts: Any) -> Optional[str]:
+    """对步骤名、上一步的键与本步参数 (均为小对象) 做哈希；无法序列化时返回 None (不使用检查点)。"""
+    try:
+        payload = pickle.dumps((CHECKPOINT_VERSION,) + parts, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+    return hashlib.sha256(payload).hexdigest()
+
+
+def canonical_value(value: Any) -> Any:
+    """字典按键排序、序列转为元组，使内容相同的行序列化结果一致。"""
+    if isinstance(value, Mapping):
+        return tuple(sorted(((str(key), canonical_value(item)) for key, item in value.items())))
+    if isinstance(value, (list, tuple)):
+        return tuple(canonical_value(item) for item in value)
+    return value
+
+
+def inputs_fingerprint(departments: Mapping[str, Rows]) -> Optional[str]:
+    """对各部门输入行的内容做 sha256 (逐行序列化)；含无法序列化的值时返回 None (不使用检查点)。"""
+    digest = hashlib.sha256()
+    try:
+        for department, rows in departments.items():
+            digest.update(pickle.dumps((department, len(rows)), protocol=pickle.HIGHEST_PROTOCOL))
+            for row in rows:
+                digest.update(pickle.dumps(canonical_value(row), protocol=pickle.HIGHEST_PROTOCOL))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return None
+    return digest.hexdigest()
+
+
+@dataclass
+class StageCheckpoints:
+    """每个 (步骤, 部门组合) 只保留最近一次的结果 (键 + 消息 + 输出数据)，目录不随运行次数增长。
+
+    文件中先写键、再写数据，键不匹配时不反序列化数据。
+    """
+
+    directory: Path
+    scope: str
+
+    def _path(self, step: str) -> Path:
+        return Path(self.directory) / f"{step}_{self.scope}.pkl"
+
+    def load(self, step: str, key: Optional[str]) -> Optional[Tuple[str, Any]]:
+        if key is None:
+            return None
+        path = self._path(step)
+        if not path.exists():
+            return None
+        try:
+            with path.open("rb") as handle:
+                if pickle.load(handle) != key:
+                    return None
+                return pickle.load(handle)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+
+    def store(self, step: str, key: Optional[str], message: str, data: Any) -> None:
+        if key is None:
+            return
+        path = self._path(step)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with temp_path.open("wb") as handle:
+            pickle.dump(key, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump((message, data), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+
+def run_checkpointed(
+    step: str,
+    key: Optional[str],
+    departments: Iterable[str],
+    run_step,
+    checkpoints: Optional[StageCheckpoints],
+    logger: ScheduleLogger,
+) -> Result[Any]:
+    """命中检查点时直接返回保存的结果，否则执行步骤并保存成功的结果。"""
+    if checkpoints is None or key is None:
+        return run_step()
+
+    saved = checkpoints.load(step, key)
+    if saved is not None:
+        message, data = saved
+        for department in departments:
+            logger.log(department, step, "OK", "输入未变化，从检查点恢复")
+        return Result.ok(message, data)
+
+    result = run_step()
+    if result.success:
+        checkpoints.store(step, key, result.message, result.data)
+    return result
+
+
+# ============================================================================
+# 区间校验工具
+# ============================================================================
+
+def to_minutes(value: Any) -> Optional[int]:
+    """时间值转换为分钟数。
+
+    数值一律按 Excel 序列值取一天内的时刻 (与 break_scheduler.parse_minute 一致)，
+    datetime 按绝对时间处理。
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.toordinal() * MINUTES_PER_DAY + value.hour * 60 + value.minute
+    if isinstance(value, time):
+        return value.hour * 60 + value.minute
+    if isinstance(value, timedelta):
+        return int(value.total_seconds() // 60)
+    if isinstance(value, (int, float)):
+        # 先按微秒取整，避免 0.4270833 这类序列值向下偏一分钟
+        return round((value % 1) * MICROSECONDS_PER_DAY) // MICROSECONDS_PER_MINUTE % MINUTES_PER_DAY
+    if isinstance(value, str):
+        match = TIME_PATTERN.fullmatch(value.strip())
+        if match:
+            return int(match[1]) * 60 + int(match[2])
+    raise ValueError(f"无法解析时间值: {value!r}")
+
+
+def to_interval(start_value: Any, end_value: Any) -> Optional[Tuple[int, int]]:
+    """转换为 [start, end) 区间；结束早于开始视为跨夜。缺少任一端时返回 None。"""
+    start, end = to_minutes(start_value), to_minutes(end_value)
+    if start is None or end is None:
+        return None
+    if end < start:
+        end += MINUTES_PER_DAY
+    return start, end
+
+
+def format_minute(minute: int) -> str:
+    day, minute = divmod(minute, MINUTES_PER_DAY)
+    text = f"{minute // 60:02d}:{minute % 60:02d}"
+    return f"{text}(+{day})" if day == 1 else text
+
+
+def iter_break_values(row: Mapping[str, Any]) -> Iterator[Tuple[Any, Any]]:
+    """行内休息: 支持 {"start", "end"} 字典或 (start, end) 二元组。"""
+    for item in row.get("breaks") or []:
+        if isinstance(item, dict):
+            yield item.get("start"), item.get("end")
+        else:
+            yield item[0], item[1]
+
+
+def find_overlaps(intervals: List[Tuple[int, int, int]]) -> Iterator[Tuple[int, int, int, int]]:
+    """扫描线找出所有重叠区间对。
+
+    intervals 为 (start, end, position)；按开始时间排序后用以结束时间为键的堆维护活动区间，
+    产出 (重叠开始, 重叠结束, 先开始的行, 后开始的行)。复杂度 O(n log n + 冲突数)。
+    """
+    active: List[Tuple[int, int, int]] = []
+    for start, end, position in sorted(intervals):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for other_end, _, other_position in active:
+            yield start, min(end, other_end), other_position, position
+        heapq.heappush(active, (end, start, position))
+
+
+def find_coverage_gaps(
+    work: List[Tuple[int, int, int]],
+    breaks: List[Tuple[int, int, int]],
+) -> Iterator[Tuple[int, int, Tuple[int, ...]]]:
+    """在工位最早上班到最晚下班之间，找出无人在岗 (上班且不在休息) 的时段。
+
+    休息按班次时间轴比较: 早于最早上班时间的钟点休息平移 +1440 (与 find_clock_overlaps 一致)，
+    跨夜班 22:00-06:00 中 02:00 开始的休息才会落在 1320-1800 之内。
+    产出 (缺口开始, 缺口结束, 缺口两端相关的行)。
+    """
+    if not work:
+        return
+    window_start = min(start for start, _, _ in work)
+    window_end = max(end for _, end, _ in work)
+    events: Dict[int, List[Tuple[int, int]]] = {}
+    for start, end, position in work:
+        events.setdefault(start, []).append((1, position))
+        events.setdefault(end, []).append((-1, position))
+    for start, end, position in breaks:
+        if start < window_start and start < MINUTES_PER_DAY:
+            start, end = start + MINUTES_PER_DAY, end + MINUTES_PER_DAY
+        events.setdefault(start, []).append((-1, position))
+        events.setdefault(end, []).append((1, position))
+
+    on_duty = 0
+    gap_start: Optional[int] = None
+    for minute in sorted(events):
+        if minute > window_end:
+            break
+        on_duty += sum(delta for delta, _ in events[minute])
+        if on_duty <= 0 and gap_start is None and window_start <= minute < window_end:
+            gap_start = minute
+        elif on_duty > 0 and gap_start is not None:
+            positions = {position for _, position in events[gap_start] + events[minute]}
+            yield gap_start, minute, tuple(sorted(positions))
+            gap_start = None
+
+
+def find_clock_overlaps(intervals: List[Tuple[int, int, int]]) -> Iterator[Tuple[int, int, int, int]]:
+    """按同一班次时间轴找重叠: 钟点区间 (开始 < 1440) 再平移 +1440 参与扫描。
+
+    跨夜班 22:00-06:00 记为 1320-1800，次日清晨的 05:00-07:00 (300-420) 平移后为 1740-1860，
+    两者的重叠才能被发现。datetime 得到的绝对分钟数不平移。每对行只报告一次。
+    """
+    shifted = [
+        (start + MINUTES_PER_DAY, end + MINUTES_PER_DAY, position)
+        for start, end, position in intervals
+        if start < MINUTES_PER_DAY
+    ]
+    reported = set()
+    for start, end, first, second in find_overlaps(intervals + shifted):
+        pair = (min(first, second), max(first, second))
+        if first == second or pair in reported:
+            continue
+        reported.add(pair)
+        yield start, end, first, second
+
+
+def validate_department(department: str, rows: Sequence[Mapping[str, Any]], check_coverage: bool) -> List[ScheduleConflict]:
+    """校验单个部门: 员工班次/休息重叠、工位覆盖缺口、无法解析的时间。"""
+    conflicts: List[ScheduleConflict] = []
+    shifts: Dict[Any, List[Tuple[int, int, int]]] = {}
+    employee_breaks: Dict[Any, List[Tuple[int, int, int]]] = {}
+    station_work: Dict[Any, List[Tuple[int, int, int]]] = {}
+    station_breaks: Dict[Any, List[Tuple[int, int, int]]] = {}
+
+    for position, row in enumerate(rows):
+        employee = row.get("employee")
+        station = row.get("station")
+        try:
+            interval = to_interval(row.get("start"), row.get("end"))
+            row_breaks = [to_interval(start, end) for start, end in iter_break_values(row)]
+        except (ValueError, TypeError, IndexError):
+            conflicts.append(ScheduleConflict(department, "invalid_time", employee, 0, 0, (position,)))
+            continue
+
+        if interval is not None:
+            if employee is not None:
+                shifts.setdefault(employee, []).append((*interval, position))
+            station_work.setdefault(station, []).append((*interval, position))
+        for break_interval in row_breaks:
+            if break_interval is None:
+                continue
+            if employee is not None:
+                employee_breaks.setdefault(employee, []).append((*break_interval, position))
+            station_breaks.setdefault(station, []).append((*break_interval, position))
+
+    for kind, intervals_by_employee in (("shift_overlap", shifts), ("break_overlap", employee_breaks)):
+        for employee, intervals in intervals_by_employee.items():
+            for start, end, first, second in find_clock_overlaps(intervals):
+                conflicts.append(ScheduleConflict(department, kind, employee, start, end, (first, second)))
+
+    if check_coverage:
+        for station, work in station_work.items():
+            for start, end, positions in find_coverage_gaps(work, station_breaks.get(station, [])):
+                conflicts.append(ScheduleConflict(department, "coverage_gap", station, start, end, positions))
+
+    return conflicts
 
 
 # ============================================================================
@@ -103,77 +636,115 @@ def LoadInputs(params: LoadInputsParams, logger: Optional[ScheduleLogger] = None
     if not params.departments:
         return Result.fail("未提供任何部门输入数据。")
 
-    logger = logger or ScheduleLogger()
+    logger = logger or default_logger()
+    departments: Dict[str, RowStore] = {}
     for department, rows in params.departments.items():
+        started = perf_counter()
+        departments[department] = as_row_store(rows)
+        elapsed = perf_counter() - started
         if not rows:
-            logger.log(department, "LoadInputs", "WARN", "部门输入为空")
+            logger.log(department, "LoadInputs", "WARN", "部门输入为空", elapsed, 0)
         else:
-            logger.log(department, "LoadInputs", "OK", f"读取 {len(rows)} 行输入")
+            logger.log(department, "LoadInputs", "OK", f"读取 {len(rows)} 行输入", elapsed, len(rows))
 
-    return Result.ok("输入加载完成。", InputBundle(departments=params.departments))
+    return Result.ok("输入加载完成。", InputBundle(departments=departments))
 
 
 def AssignStations(params: AssignStationsParams, logger: Optional[ScheduleLogger] = None) -> Result[StationAssignment]:
-    logger = logger or ScheduleLogger()
-    assignments: Dict[str, List[Dict[str, Any]]] = {}
+    logger = logger or default_logger()
+    assignments: Dict[str, RowStore] = {}
 
     for department, rows in params.inputs.departments.items():
-        assigned_rows = []
-        for row in rows:
-            assigned = dict(row)
-            assigned.setdefault("station", "UNASSIGNED")
-            assigned_rows.append(assigned)
+        started = perf_counter()
+        assigned_rows = as_row_store(rows).with_default("station", "UNASSIGNED")
         assignments[department] = assigned_rows
-        logger.log(department, "AssignStations", "OK", f"已分配 {len(assigned_rows)} 条记录")
+        logger.log(
+            department,
+            "AssignStations",
+            "OK",
+            f"已分配 {len(assigned_rows)} 条记录",
+            perf_counter() - started,
+            len(assigned_rows),
+        )
 
     return Result.ok("工位分配完成。", StationAssignment(assignments))
 
 
 def InsertBreaks(params: InsertBreaksParams, logger: Optional[ScheduleLogger] = None) -> Result[BreakPlan]:
-    logger = logger or ScheduleLogger()
-    schedule: Dict[str, List[Dict[str, Any]]] = {}
+    logger = logger or default_logger()
+    schedule: Dict[str, RowStore] = {}
 
     for department, rows in params.assignments.departments.items():
-        updated_rows = []
-        for row in rows:
-            updated = dict(row)
-            updated.setdefault("breaks", [])
-            updated_rows.append(updated)
+        started = perf_counter()
+        # 尚未排休息的行共享空元组，不为每行分配空列表
+        updated_rows = as_row_store(rows).with_default("breaks", ())
         schedule[department] = updated_rows
-        logger.log(department, "InsertBreaks", "OK", f"已插入 {len(updated_rows)} 条记录的休息时间")
+        logger.log(
+            department,
+            "InsertBreaks",
+            "OK",
+            f"已插入 {len(updated_rows)} 条记录的休息时间",
+            perf_counter() - started,
+            len(updated_rows),
+        )
 
     return Result.ok("休息时间插入完成。", BreakPlan(schedule))
 
 
 def ValidateOverlaps(params: ValidateOverlapsParams, logger: Optional[ScheduleLogger] = None) -> Result[BreakPlan]:
-    logger = logger or ScheduleLogger()
+    logger = logger or default_logger()
+    conflicts: List[ScheduleConflict] = []
     overlap_errors: List[str] = []
 
     for department, rows in params.break_plan.schedule.items():
-        seen = set()
-        for row in rows:
-            key = (row.get("employee"), row.get("start"), row.get("end"))
-            if key in seen:
-                overlap_errors.append(f"{department} 存在重复排班: {key}")
-            seen.add(key)
-
-        if overlap_errors:
-            logger.log(department, "ValidateOverlaps", "FAIL", "检测到排班冲突")
+        started = perf_counter()
+        department_conflicts = validate_department(department, rows, params.check_coverage)
+        errors = [
+            conflict
+            for conflict in department_conflicts
+            if conflict.kind != "coverage_gap" or params.coverage_gap_is_error
+        ]
+        conflicts.extend(department_conflicts)
+        overlap_errors.extend(conflict.describe() for conflict in errors)
+
+        gap_count = len(department_conflicts) - len(errors)
+        elapsed = perf_counter() - started
+        if errors:
+            status, message = "FAIL", f"检测到 {len(errors)} 处排班冲突"
+        elif gap_count:
+            status, message = "WARN", f"检测到 {gap_count} 处工位覆盖缺口"
         else:
-            logger.log(department, "ValidateOverlaps", "OK", "未检测到排班冲突")
+            status, message = "OK", "未检测到排班冲突"
+        logger.log(department, "ValidateOverlaps", status, message, elapsed, len(rows))
 
     if overlap_errors:
         return Result.fail("排班冲突校验失败。", overlap_errors)
 
-    return Result.ok("排班冲突校验通过。", params.break_plan)
+    return Result.ok(
+        "排班冲突校验通过。",
+        BreakPlan(params.break_plan.schedule, conflicts=conflicts),
+    )
+
+
+def export_rows(rows: Rows) -> List[Dict[str, Any]]:
+    """流程内部的 RowStore 在导出边界物化为普通字典列表，breaks 转为列表，调用方可直接修改或序列化。"""
+    exported = []
+    for row in as_row_store(rows):
+        record = dict(row)
+        if "breaks" in record:
+            record["breaks"] = list(record["breaks"])
+        exported.append(record)
+    return exported
 
 
 def ExportMaster(params: ExportMasterParams, logger: Optional[ScheduleLogger] = None) -> Result[Dict[str, List[Dict[str, Any]]]]:
-    logger = logger or ScheduleLogger()
-    export_payload = params.break_plan.schedule
+    logger = logger or default_logger()
+    export_payload = {
+        department: export_rows(rows) for department, rows in params.break_plan.schedule.items()
+    }
 
-    for department in export_payload.keys():
-        logger.log(department, "ExportMaster", "OK", "已生成导出数据")
+    for department, rows in export_payload.items():
+        logger.log(department, "ExportMaster", "OK", "已生成导出数据", rows=len(rows))
 
     return Result.ok("主表导出数据准备完成。", export_payload)
 
@@ -182,32 +753,188 @@ def ExportMaster(params: ExportMasterParams, logger: Optional[ScheduleLogger] =
 # 主入口
 # ============================================================================
 
-def RunSchedule(params: RunScheduleParams) -> Result[Dict[str, List[Dict[str, Any]]]]:
-    logger = ScheduleLogger(params.log_sheet)
-    step_messages: List[str] = []
+StepResults = List[Tuple[str, Result[Any]]]
+
+
+def open_checkpoints(
+    load_inputs: LoadInputsParams, params: RunScheduleParams, logger: ScheduleLogger
+) -> Optional[StageCheckpoints]:
+    """未指定检查点目录时不使用检查点。"""
+    if params.checkpoint_dir is None:
+        return None
+    return StageCheckpoints(params.checkpoint_dir, checkpoint_key(*load_inputs.departments)[:16])
+
 
-    load_result = LoadInputs(params.load_inputs, logger)
-    step_messages.append(f"LoadInputs: {load_result.message}")
-    if not load_result.success:
-        return Result.fail("排班流程失败。", step_messages + load_result.errors)
+def run_pipeline(load_inputs: LoadInputsParams, params: RunScheduleParams, logger: ScheduleLogger) -> StepResults:
+    """依次执行 LoadInputs -> ValidateOverlaps，遇到失败即停止，返回 (步骤名, 结果) 列表。"""
+    steps: StepResults = []
+    departments = list(load_inputs.departments)
 
-    assign_result = AssignStations(AssignStationsParams(load_result.data), logger)
-    step_messages.append(f"AssignStations: {assign_result.message}")
-    if not assign_result.success:
-        return Result.fail("排班流程失败。", step_messages + assign_result.errors)
+    checkpoints = open_checkpoints(load_inputs, params, logger)
+    key = None
+    if checkpoints is not None:
+        fingerprint = inputs_fingerprint(load_inputs.departments)
+        if fingerprint is None:
+            for department in departments:
+                logger.log(department, "Checkpoint", "WARN", "输入含无法序列化的值，不使用检查点")
+        else:
+            key = checkpoint_key("LoadInputs", fingerprint)
+
+    def step_checkpoints(step: str) -> Optional[StageCheckpoints]:
+        return checkpoints if step in params.checkpoint_steps else None
 
-    break_result = InsertBreaks(
-        InsertBreaksParams(assign_result.data, break_rules=params.break_rules),
+    result: Result[Any] = run_checkpointed(
+        "LoadInputs",
+        key,
+        departments,
+        lambda: LoadInputs(load_inputs, logger),
+        step_checkpoints("LoadInputs"),
+        logger,
+    )
+    steps.append(("LoadInputs", result))
+    if not result.success:
+        return steps
+
+    bundle = result.data
+    key = checkpoint_key("AssignStations", key) if key else None
+    result = run_checkpointed(
+        "AssignStations",
+        key,
+        departments,
+        lambda: AssignStations(AssignStationsParams(bundle), logger),
+        step_checkpoints("AssignStations"),
+        logger,
+    )
+    steps.append(("AssignStations", result))
+    if not result.success:
+        return steps
+
+    assignment = result.data
+    key = checkpoint_key("InsertBreaks", key, params.break_rules) if key else None
+    result = run_checkpointed(
+        "InsertBreaks",
+        key,
+        departments,
+        lambda: InsertBreaks(InsertBreaksParams(assignment, break_rules=params.break_rules), logger),
+        step_checkpoints("InsertBreaks"),
         logger,
     )
-    step_messages.append(f"InsertBreaks: {break_result.message}")
-    if not break_result.success:
-        return Result.fail("排班流程失败。", step_messages + break_result.errors)
-
-    validate_result = ValidateOverlaps(ValidateOverlapsParams(break_result.data), logger)
-    step_messages.append(f"ValidateOverlaps: {validate_result.message}")
-    if not validate_result.success:
-        return Result.fail("排班流程失败。", step_messages + validate_result.errors)
+    steps.append(("InsertBreaks", result))
+    if not result.success:
+        return steps
+
+    result = ValidateOverlaps(ValidateOverlapsParams(result.data), logger)
+    steps.append(("ValidateOverlaps", result))
+    return steps
+
+
+def merge_department_data(items: List[Any]) -> Any:
+    """按部门顺序合并各部门同一步骤的输出。"""
+    first = items[0]
+    if isinstance(first, BreakPlan):
+        return BreakPlan(
+            {department: rows for item in items for department, rows in item.schedule.items()},
+            conflicts=[conflict for item in items for conflict in item.conflicts],
+        )
+    if isinstance(first, StationAssignment):
+        return StationAssignment(
+            {department: rows for item in items for department, rows in item.departments.items()}
+        )
+    return InputBundle({department: rows for item in items for department, rows in item.departments.items()})
+
+
+def join_department_steps(per_department: List[StepResults]) -> StepResults:
+    """把各部门的步骤结果合并为与顺序执行一致的步骤结果。
+
+    取最早出现失败的步骤：该步骤的错误按部门顺序拼接，之后的步骤不再出现。
+    """
+    steps: StepResults = []
+    for index in range(max(len(department_steps) for department_steps in per_department)):
+        step = per_department[0][index][0]
+        results = [department_steps[index][1] for department_steps in per_department]
+        failed = [result for result in results if not result.success]
+        if failed:
+            errors = [error for result in failed for error in result.errors]
+            steps.append((step, Result.fail(failed[0].message, errors)))
+            return steps
+        data = [result.data for result in results]
+        merged = merge_department_data(data) if data[0] is not None else None
+        steps.append((step, Result.ok(results[0].message, merged)))
+    return steps
+
+
+def init_department_worker() -> None:
+    """进程池 initializer: 工作进程不写任何日志目标。
+
+    本模块导入时不配置日志；fork 启动的工作进程会继承主进程 logging 的处理器，
+    spawn 启动时调用方的主模块可能在重新导入时再次配置。两种情况都在这里移除根处理器，
+    步骤日志只经 ScheduleLogger 记录交回主进程写出，避免重复的处理器与文件写入。
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+
+def run_department_pipeline(
+    department: str, rows: Rows, params: RunScheduleParams
+) -> Tuple[StepResults, List[LogRecord]]:
+    """进程池任务: 单个部门走完 LoadInputs -> ValidateOverlaps，日志记录随结果交回主进程。
+
+    只有最后一步的数据会被导出，中间步骤的数据不传回，减少进程间序列化的数据量。
+    """
+    logger = ScheduleLogger(buffer_size=sys.maxsize)
+    steps = run_pipeline(LoadInputsParams({department: rows}), params, logger)
+    steps = [
+        (step, result if index == len(steps) - 1 else replace(result, data=None))
+        for index, (step, result) in enumerate(steps)
+    ]
+    return steps, logger.drain()
+
+
+def run_departments_concurrently(params: RunScheduleParams, logger: ScheduleLogger) -> StepResults:
+    """每个部门在进程池中独立执行，按输入中的部门顺序汇合结果与日志。
+
+    各步骤是纯 Python 计算，线程受 GIL 限制无法并行，因此使用进程；
+    每个进程只接收本部门的行，日志目标 (工作表/文件) 只在主进程写出。
+    """
+    departments = params.load_inputs.departments
+    max_workers = min(params.workers, len(departments))
+    task_params = replace(params, load_inputs=LoadInputsParams({}), log_sheet=None, log_file=None)
+    per_department: List[StepResults] = []
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_department_worker) as executor:
+        futures = [
+            executor.submit(run_department_pipeline, department, rows, task_params)
+            for department, rows in departments.items()
+        ]
+        for future in futures:
+            steps, records = future.result()
+            logger.extend(records)
+            per_department.append(steps)
+    return join_department_steps(per_department)
+
+
+def RunSchedule(params: RunScheduleParams) -> Result[Dict[str, List[Dict[str, Any]]]]:
+    logger = ScheduleLogger(params.log_sheet, params.log_file)
+    try:
+        return run_schedule_steps(params, logger)
+    finally:
+        logger.flush()
+
+
+def run_schedule_steps(params: RunScheduleParams, logger: ScheduleLogger) -> Result[Dict[str, List[Dict[str, Any]]]]:
+    step_messages: List[str] = []
+
+    if params.workers > 1 and len(params.load_inputs.departments) > 1:
+        steps = run_departments_concurrently(params, logger)
+    else:
+        steps = run_pipeline(params.load_inputs, params, logger)
+
+    for step, result in steps:
+        step_messages.append(f"{step}: {result.message}")
+        if not result.success:
+            return Result.fail("排班流程失败。", step_messages + result.errors)
+
+    validate_result = steps[-1][1]
 
     export_result = ExportMaster(
         ExportMasterParams(validate_result.data, output_options=params.output_options),
@@ -0,0 +1,230 @@
+"""
+休息排班性能基准
+
+功能:
+1. 生成合成的 BreakRules / Schedule 表 (100 ~ 100k 名员工，部门/站位/已有休息数量随规模变化)
+2. 分别计时 load_break_rules、load_schedule_entries、insert_breaks、write_breaks
+3. 用 tracemalloc 记录各阶段内存峰值 (单独一轮执行，避免追踪开销影响计时)
+4. 结果写入 JSON，便于不同版本之间比较回归
+
+用法:
+    python benchmark_break_scheduler.py --sizes 100 1000 10000 --label v2
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, time as dt_time
+from pathlib import Path
+import argparse
+import json
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableColumn
+
+from break_scheduler import BreakScheduler, Config as SchedulerConfig, iter_break_rules, Roster
+
+
+class Config:
+    """基准配置"""
+
+    SIZES = [100, 1_000, 10_000, 100_000]
+    RESULT_DIR = Path(__file__).resolve().parent.parent / "benchmarks"
+    SEED = 20260101
+
+    EMPLOYEES_PER_DEPT = 400
+    STATIONS_PER_DEPT = 25
+    ROLES = ["Operator", "Packer", "Lead"]
+    EXISTING_BREAK_RATIO = 0.05
+
+
+@dataclass
+class PhaseResult:
+    seconds: float
+    peak_kb: float | None = None
+
+
+@dataclass
+class SizeResult:
+    employees: int
+    departments: int
+    stations: int
+    existing_breaks: int
+    breaks_generated: int = 0
+    phases: dict[str, PhaseResult] = field(default_factory=dict)
+
+
+RULE_HEADERS = ["DeptID", "BreakStart", "BreakEnd", "BatchCount", "BatchSize", "MaxConcurrent"]
+SCHEDULE_HEADERS = ["DeptID", "EmployeeID", "Station", "Role", "Type", "StartTime", "EndTime"]
+# 已有休息的时段: 与两条规则时段部分或完全重叠，另有一段在时段之外
+EXISTING_BREAK_SLOTS = [
+    ("10:00", "10:15"),
+    ("10:10", "10:25"),
+    ("12:00", "12:15"),
+    ("12:20", "12:35"),
+    ("12:50", "13:05"),
+    ("15:00", "15:10"),
+]
+
+
+def add_table(ws, name: str, headers: list[str], row_count: int) -> None:
+    """在只写工作表上登记表 (只写模式需手工给出列定义)"""
+    table = Table(
+        displayName=name,
+        ref=f"A1:{get_column_letter(len(headers))}{row_count + 1}",
+        tableColumns=[TableColumn(id=index, name=header) for index, header in enumerate(headers, 1)],
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        ws.add_table(table)
+
+
+def build_synthetic_workbook(path: Path, employees: int, seed: int = Config.SEED) -> SizeResult:
+    """生成含 BreakRules / Schedule 表的合成工作簿"""
+    rnd = random.Random(seed)
+    departments = max(1, employees // Config.EMPLOYEES_PER_DEPT)
+    stations = min(Config.STATIONS_PER_DEPT, max(1, employees // departments // 4))
+
+    wb = openpyxl.Workbook(write_only=True)
+
+    rules_ws = wb.create_sheet("BreakRules")
+    rules_ws.append(RULE_HEADERS)
+    max_concurrent = 2 * Config.EMPLOYEES_PER_DEPT
+    for dept in range(departments):
+        dept_id = f"D{dept:03d}"
+        # 部门人数不超过 2 × EMPLOYEES_PER_DEPT，以此作 MaxConcurrent:
+        # 时段内已有的休息计入并发占用 (走区间索引)，但不会导致违规
+        rules_ws.append([dept_id, dt_time(10, 0), dt_time(10, 30), 2, None, max_concurrent])
+        rules_ws.append([dept_id, "12:00", "13:00", None, 4, max_concurrent])
+    add_table(rules_ws, SchedulerConfig.BREAK_RULES_TABLE, RULE_HEADERS, departments * 2)
+
+    schedule_ws = wb.create_sheet("Schedule")
+    schedule_ws.append(SCHEDULE_HEADERS)
+    # 上班时间混用 time / 字符串 / Excel 序列值，覆盖各解析分支
+    shift_starts = [dt_time(6, 0), "06:00", 0.25, dt_time(7, 0)]
+    existing_breaks = 0
+    for index in range(employees):
+        dept_id = f"D{rnd.randrange(departments):03d}"
+        station = f"ST{rnd.randrange(stations):02d}"
+        role = rnd.choice(Config.ROLES)
+        employee_id = f"E{index:06d}"
+        schedule_ws.append(
+            [dept_id, employee_id, station, role, "Work", rnd.choice(shift_starts), "14:30"]
+        )
+        if rnd.random() < Config.EXISTING_BREAK_RATIO:
+            # 人工录入的休息，多数落在规则时段内 (计入并发占用)，少数在时段之外
+            start, end = rnd.choice(EXISTING_BREAK_SLOTS)
+            schedule_ws.append([dept_id, employee_id, station, role, "Break", start, end])
+            existing_breaks += 1
+    add_table(
+        schedule_ws, SchedulerConfig.SCHEDULE_TABLE, SCHEDULE_HEADERS, employees + existing_breaks
+    )
+
+    wb.save(path)
+    return SizeResult(
+        employees=employees,
+        departments=departments,
+        stations=departments * stations,
+        existing_breaks=existing_breaks,
+    )
+
+
+class PhaseRunner:
+    """按阶段执行并记录: 计时轮只计时，内存轮只用 tracemalloc 记录峰值"""
+
+    def __init__(self, result: SizeResult, trace_memory: bool):
+        self.result = result
+        self.trace_memory = trace_memory
+
+    def measure(self, name: str, func):
+        if not self.trace_memory:
+            started = time.perf_counter()
+            value = func()
+            self.result.phases[name] = PhaseResult(seconds=round(time.perf_counter() - started, 4))
+            return value
+
+        tracemalloc.start()
+        try:
+            value = func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.result.phases[name].peak_kb = round(peak / 1024, 1)
+        return value
+
+
+def run_phases(path: Path, runner: PhaseRunner) -> None:
+    scheduler = BreakScheduler(path)
+    # 分表读取以单独计时，结果进入读取器缓存，insert_breaks 直接复用
+    runner.measure(
+        "load_break_rules",
+        lambda: scheduler.reader.read_tables(
+            {SchedulerConfig.BREAK_RULES_TABLE: lambda rows: list(iter_break_rules(rows))}
+        ),
+    )
+    runner.measure(
+        "load_schedule_entries",
+        lambda: scheduler.reader.read_tables({SchedulerConfig.SCHEDULE_TABLE: Roster.from_rows}),
+    )
+    breaks = runner.measure("insert_breaks", scheduler.insert_breaks)
+    runner.result.breaks_generated = len(breaks)
+
+    runner.measure("load_workbook", scheduler.load_workbook)
+    runner.measure("write_breaks", lambda: scheduler.write_breaks(breaks))
+    runner.measure("save", lambda: scheduler.wb.save(path))
+
+
+def run_size(work_dir: Path, employees: int, trace_memory: bool) -> SizeResult:
+    path = work_dir / f"bench_{employees}.xlsx"
+    result = build_synthetic_workbook(path, employees)
+    # 每轮从新生成的工作簿开始，保证两轮输入一致
+    run_phases(path, PhaseRunner(result, trace_memory=False))
+    if trace_memory:
+        build_synthetic_workbook(path, employees)
+        run_phases(path, PhaseRunner(result, trace_memory=True))
+    return result
+
+
+def main(argv=None) -> Path:
+    parser = argparse.ArgumentParser(description="休息排班性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=Config.SIZES)
+    parser.add_argument("--label", default="", help="版本标签，写入结果文件")
+    parser.add_argument("--output", type=Path, default=None, help="结果 JSON 路径")
+    parser.add_argument("--no-memory", action="store_true", help="跳过内存峰值测量轮")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for employees in args.sizes:
+            result = run_size(Path(tmp), employees, trace_memory=not args.no_memory)
+            total = sum(phase.seconds for phase in result.phases.values())
+            print(f"{employees:>7} 名员工: 共 {total:.2f}s")
+            for name, phase in result.phases.items():
+                peak = "-" if phase.peak_kb is None else f"{phase.peak_kb:.1f} KB"
+                print(f"    {name:<22} {phase.seconds:>9.4f}s  峰值 {peak:>12}")
+            results.append(result)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output = args.output or Config.RESULT_DIR / f"break_scheduler_bench_{timestamp}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "label": args.label,
+        "timestamp": timestamp,
+        "python": platform.python_version(),
+        "openpyxl": openpyxl.__version__,
+        "results": [asdict(result) for result in results],
+    }
+    output.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"结果已写入: {output}")
+    return output
+
+
+if __name__ == "__main__":
+    main()
@@ -5,20 +5,28 @@
 1. 从 BreakRules 表读取按 DeptID 定义的休息段
 2. 支持 BatchCount / BatchSize 两种分批模式
 3. 按站位/工种分批安排休息
-4. 冲突检查：同一时段休息人数不得超过允许上限
-5. 输出休息安排至 Schedule 表
+4. 冲突检查：同一时段休息人数不得超过允许上限，按站位均衡分配时段，不可行时输出违规报告
+5. 输出休息安排至 Schedule 表 (重跑时替换此前生成的休息记录)
 """
 
 from __future__ import annotations
 
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, time, timedelta
 from pathlib import Path
+from xml.etree import ElementTree
+import bisect
 import logging
 import math
+import posixpath
+import re
+import zipfile
 
 import openpyxl
-from openpyxl.utils import get_column_letter
+from openpyxl.utils import get_column_letter, range_boundaries
 
 
 class Config:
@@ -32,14 +40,28 @@ class Config:
 
     BREAK_RULES_TABLE = "BreakRules"
     SCHEDULE_TABLE = "Schedule"
+    # 本工具写入的 Break 行记录在此隐藏工作表中 (不改动 Schedule 表结构)，
+    # 重跑时只替换内容与记录一致的行
+    GENERATED_SHEET = "_BreakScheduler_Generated"
 
 
-def setup_logging():
-    """配置日志系统"""
-    log_dir = Config.LOG_DIR
-    log_dir.mkdir(parents=True, exist_ok=True)
+logger = logging.getLogger(__name__)
+_log_file: Path | None = None
 
-    log_file = log_dir / f"break_scheduler_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+
+def setup_logging(log_file: Path | None = None) -> logging.Logger:
+    """配置日志系统 (由入口调用，不在导入时执行)
+
+    工作进程通过进程池 initializer 传入主进程的日志文件，以追加方式写入同一文件；
+    已配置过时直接返回，spawn 方式启动的工作进程重新导入模块也不会重复添加处理器。
+    """
+    global _log_file
+    if _log_file is not None:
+        return logger
+
+    if log_file is None:
+        Config.LOG_DIR.mkdir(parents=True, exist_ok=True)
+        log_file = Config.LOG_DIR / f"break_scheduler_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
 
     logging.basicConfig(
         level=logging.INFO,
@@ -49,20 +71,20 @@ def setup_logging():
             logging.StreamHandler(),
         ],
     )
+    _log_file = log_file
+    return logger
 
-    return logging.getLogger(__name__)
 
-
-logger = setup_logging()
+MINUTES_PER_DAY = 24 * 60
 
 
 @dataclass(frozen=True)
 class BreakRule:
-    """休息规则"""
+    """休息规则 (时间为一天内的分钟数)"""
 
     dept_id: str
-    break_start: time
-    break_end: time
+    break_start: int | None
+    break_end: int | None
     batch_count: int | None
     batch_size: int | None
     max_concurrent: int | None
@@ -70,17 +92,28 @@ class BreakRule:
 
 @dataclass(frozen=True)
 class ScheduleEntry:
-    """排班记录"""
+    """排班记录 (时间为一天内的分钟数)，用于生成的休息记录；输入排班以 Roster 列式保存"""
 
     dept_id: str
     employee_id: str
     station: str
     role: str
-    start_time: time | None
-    end_time: time | None
+    start_minute: int | None
+    end_minute: int | None
     entry_type: str
 
 
+@dataclass(frozen=True)
+class WriteSummary:
+    """Schedule 表写入结果"""
+
+    inserted: int
+    replaced: int
+    removed: int
+    rows_written: int
+    record_updated: bool = False
+
+
 def parse_time(value) -> time | None:
     """解析时间值"""
     if value is None or value == "":
@@ -108,24 +141,193 @@ def normalize_text(value) -> str:
     return str(value).strip()
 
 
-def add_minutes(start: time, minutes: float) -> time:
-    base = datetime.combine(datetime.today(), start) + timedelta(minutes=minutes)
-    return base.time()
+@dataclass(frozen=True)
+class PlacementViolation:
+    """无法在休息人数上限内安排的员工 (时段取超限最少的候选时段)"""
+
+    dept_id: str
+    employee_id: str
+    station: str
+    role: str
+    start_minute: int
+    end_minute: int
+    required: int
+    limit: int
+
+
+class BreakPlacementError(ValueError):
+    """休息安排不可行，violations 为完整违规报告"""
+
+    MAX_REPORT_LINES = 20
+
+    def __init__(self, violations: list[PlacementViolation]):
+        self.violations = violations
+        lines = [f"{len(violations)} 名员工无法在休息人数上限内安排:"]
+        for item in violations[: self.MAX_REPORT_LINES]:
+            lines.append(
+                f"DeptID {item.dept_id} {item.station}/{item.role} {item.employee_id}: "
+                f"{minute_to_time(item.start_minute)}-{minute_to_time(item.end_minute)} "
+                f"需 {item.required} 人 / 上限 {item.limit}"
+            )
+        if len(violations) > self.MAX_REPORT_LINES:
+            lines.append(f"... 其余 {len(violations) - self.MAX_REPORT_LINES} 条略")
+        super().__init__("\n".join(lines))
+
+
+def time_to_minute(value: time | None) -> int | None:
+    """时间 -> 一天内的分钟数"""
+    if value is None:
+        return None
+    return value.hour * 60 + value.minute
+
+
+def minute_to_time(minute: int) -> time:
+    """一天内的分钟数 (允许越过零点) -> 时间"""
+    minute %= MINUTES_PER_DAY
+    return time(minute // 60, minute % 60)
+
+
+HHMM_PATTERN = re.compile(r"(\d{1,2}):(\d{1,2})(?::(\d{1,2}))?")
+MICROSECONDS_PER_DAY = 86_400_000_000
+MICROSECONDS_PER_MINUTE = 60_000_000
+
+
+def parse_minute(value) -> int | None:
+    """解析时间值为一天内的分钟数 ("HH:MM[:SS]" 与 Excel 序列值直接计算，不经 strptime)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        match = HHMM_PATTERN.fullmatch(value.strip())
+        if match:
+            hour, minute, second = int(match[1]), int(match[2]), int(match[3] or 0)
+            if hour < 24 and minute < 60 and second < 60:
+                return hour * 60 + minute
+        raise ValueError(f"无法解析时间值: {value}")
+    if isinstance(value, (int, float)):
+        # 与 timedelta(days=value) 相同，先按微秒取整，避免 0.4270833 这类序列值向下偏一分钟
+        microseconds = round((value % 1) * MICROSECONDS_PER_DAY)
+        return microseconds // MICROSECONDS_PER_MINUTE % MINUTES_PER_DAY
+    return time_to_minute(parse_time(value))
+
+
+_MISSING = object()
+_UNPARSED = object()
+
+
+class MinuteParser:
+    """批量时间解析器
+
+    按不同原始值缓存解析结果 (排班表中班次时间高度重复)，解析失败的值汇总记录，
+    读完整张表后统一报告，而不是遇到第一个错误即中止。
+    """
+
+    MAX_REPORT_ITEMS = 20
+
+    def __init__(self):
+        self._cache = {}
+        self.failures: list[tuple[int, str, object]] = []
+
+    def parse(self, value, row_number: int, column: str) -> int | None:
+        minute = self._cache.get(value, _MISSING)
+        if minute is _MISSING:
+            try:
+                minute = parse_minute(value)
+            except ValueError:
+                minute = _UNPARSED
+            self._cache[value] = minute
+        if minute is _UNPARSED:
+            self.failures.append((row_number, column, value))
+            return None
+        return minute
+
+    def parse_column(self, values, row_numbers, column: str) -> list[int | None]:
+        """整列解析 (row_numbers 为各值所在的工作表行号)"""
+        return [
+            self.parse(value, row_number, column)
+            for value, row_number in zip(values, row_numbers)
+        ]
+
+    def raise_failures(self, table_name: str) -> None:
+        if not self.failures:
+            return
+        preview = "; ".join(
+            f"第 {row_number} 行 {column}={value!r}"
+            for row_number, column, value in self.failures[: self.MAX_REPORT_ITEMS]
+        )
+        if len(self.failures) > self.MAX_REPORT_ITEMS:
+            preview += " ..."
+        raise ValueError(f"表 {table_name} 中 {len(self.failures)} 个时间值无法解析: {preview}")
+
+
+def time_minutes(start: int, end: int) -> int:
+    """时段时长 (分钟)，结束早于开始视为跨零点"""
+    return (end - start) % MINUTES_PER_DAY
+
+
+def overlap(start_a: int, end_a: int, start_b: int, end_b: int) -> bool:
+    return start_a < end_b and start_b < end_a
+
+
+class ShiftTimeline:
+    """班次时间轴
+
+    将一天内的分钟数换算为相对班次开始的整数分钟，跨零点的班次在时间轴上保持连续。
+    """
 
+    def __init__(self, shift_start: int):
+        self.shift_start = shift_start
 
-def time_minutes(start: time, end: time) -> int:
-    start_dt = datetime.combine(datetime.today(), start)
-    end_dt = datetime.combine(datetime.today(), end)
-    delta = end_dt - start_dt
-    return int(delta.total_seconds() // 60)
+    @classmethod
+    def from_starts(cls, starts, default: int) -> "ShiftTimeline":
+        """以上班时间推断班次开始: 取环形 24 小时中最大空档之后的第一个上班时间"""
+        distinct = sorted(set(starts))
+        if not distinct:
+            return cls(default)
+        best_gap, shift_start = -1, distinct[0]
+        for index, minute in enumerate(distinct):
+            following = distinct[(index + 1) % len(distinct)]
+            gap = (following - minute) % MINUTES_PER_DAY or MINUTES_PER_DAY
+            if gap > best_gap:
+                best_gap, shift_start = gap, following
+        return cls(shift_start)
 
+    def offset(self, minute: int) -> int:
+        return (minute - self.shift_start) % MINUTES_PER_DAY
 
-def overlap(start_a: time, end_a: time, start_b: time, end_b: time) -> bool:
-    start_dt_a = datetime.combine(datetime.today(), start_a)
-    end_dt_a = datetime.combine(datetime.today(), end_a)
-    start_dt_b = datetime.combine(datetime.today(), start_b)
-    end_dt_b = datetime.combine(datetime.today(), end_b)
-    return start_dt_a < end_dt_b and start_dt_b < end_dt_a
+    def span(self, start: int, end: int) -> tuple[int, int]:
+        begin = self.offset(start)
+        return begin, begin + time_minutes(start, end)
+
+    def to_minute(self, offset: int) -> int:
+        return (self.shift_start + offset) % MINUTES_PER_DAY
+
+
+class BreakIntervalIndex:
+    """休息区间索引
+
+    以有序的开始/结束边界数组保存休息段，二分查找统计与 [start, end) 重叠的休息数，
+    单次查询 O(log n)。
+    """
+
+    def __init__(self, intervals=()):
+        valid = [(start, end) for start, end in intervals if start < end]
+        self._starts = sorted(start for start, _ in valid)
+        self._ends = sorted(end for _, end in valid)
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def add(self, start, end) -> None:
+        if not start < end:
+            return
+        bisect.insort(self._starts, start)
+        bisect.insort(self._ends, end)
+
+    def count_overlapping(self, start, end) -> int:
+        # 重叠数 = 总数 - 在 start 之前结束的 - 在 end 之后开始的
+        ended_before = bisect.bisect_right(self._ends, start)
+        started_after = len(self._starts) - bisect.bisect_left(self._starts, end)
+        return len(self._starts) - ended_before - started_after
 
 
 def find_table(workbook, table_name):
@@ -136,25 +338,550 @@ def find_table(workbook, table_name):
     raise ValueError(f"未找到表: {table_name}")
 
 
-def read_table_rows(workbook, table_name):
-    """读取表格为行字典"""
-    ws, table = find_table(workbook, table_name)
-    cells = ws[table.ref]
-    headers = [normalize_text(cell.value) for cell in cells[0]]
-    rows = []
-    for row in cells[1:]:
-        values = [cell.value for cell in row]
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+DOC_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+OFFICE_DOCUMENT_REL_TYPE = DOC_REL_NS + "/officeDocument"
+TABLE_REL_TYPE = DOC_REL_NS + "/table"
+
+
+def read_part_relationships(archive: zipfile.ZipFile, part: str) -> list[tuple[str, str, str]]:
+    """部件的关系: [(Id, Type, 目标部件路径)]，无 .rels 时为空 (跳过外部链接)"""
+    folder, name = posixpath.split(part)
+    rels_part = posixpath.join(folder, "_rels", f"{name}.rels")
+    if rels_part not in archive.namelist():
+        return []
+    relationships = []
+    for rel in ElementTree.fromstring(archive.read(rels_part)).iter(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(folder, target))
+        relationships.append((rel.get("Id"), rel.get("Type"), target))
+    return relationships
+
+
+def resolve_table_refs(workbook_path: Path) -> dict[str, tuple[str, str]]:
+    """直接解析 xlsx 包中的表部件 (不依赖 openpyxl 内部属性): 表名 -> (工作表名, 区域)"""
+    with zipfile.ZipFile(workbook_path) as archive:
+        workbook_part = next(
+            target
+            for _, rel_type, target in read_part_relationships(archive, "")
+            if rel_type == OFFICE_DOCUMENT_REL_TYPE
+        )
+        sheet_parts = {rel_id: target for rel_id, _, target in read_part_relationships(archive, workbook_part)}
+
+        locations = {}
+        root = ElementTree.fromstring(archive.read(workbook_part))
+        for sheet in root.iter(f"{{{MAIN_NS}}}sheet"):
+            sheet_part = sheet_parts.get(sheet.get(f"{{{DOC_REL_NS}}}id"))
+            if sheet_part is None:
+                continue
+            for _, rel_type, target in read_part_relationships(archive, sheet_part):
+                if rel_type != TABLE_REL_TYPE:
+                    continue
+                table = ElementTree.fromstring(archive.read(target))
+                name = table.get("name") or table.get("displayName")
+                locations[name] = (sheet.get("name"), table.get("ref"))
+    return locations
+
+
+def iter_table_rows(ws, ref):
+    """按值元组流式读取表格区域，逐行生成 (工作表行号, 行字典) (跳过空行)"""
+    min_col, min_row, max_col, max_row = range_boundaries(ref)
+    rows = ws.iter_rows(
+        min_row=min_row,
+        max_row=max_row,
+        min_col=min_col,
+        max_col=max_col,
+        values_only=True,
+    )
+    header = next(rows, None)
+    if header is None:
+        return
+    headers = [normalize_text(value) for value in header]
+    for row_number, values in enumerate(rows, start=min_row + 1):
         if all(value in (None, "") for value in values):
             continue
-        rows.append(dict(zip(headers, values)))
-    return ws, table, headers, rows
+        yield row_number, dict(zip(headers, values))
+
+
+def iter_break_rules(rows):
+    """(行号, 行字典) -> BreakRule (时间解析失败在读完后汇总抛出)"""
+    parser = MinuteParser()
+    for row_number, row in rows:
+        dept_id = normalize_text(row.get("DeptID"))
+        if not dept_id:
+            continue
+        batch_count = row.get("BatchCount")
+        batch_size = row.get("BatchSize")
+        max_concurrent = row.get("MaxConcurrent")
+        yield BreakRule(
+            dept_id=dept_id,
+            break_start=parser.parse(row.get("BreakStart"), row_number, "BreakStart"),
+            break_end=parser.parse(row.get("BreakEnd"), row_number, "BreakEnd"),
+            batch_count=int(batch_count) if batch_count else None,
+            batch_size=int(batch_size) if batch_size else None,
+            max_concurrent=int(max_concurrent) if max_concurrent else None,
+        )
+    parser.raise_failures(Config.BREAK_RULES_TABLE)
+
+
+NO_MINUTE = -1
+
+
+GENERATED_HEADERS = ["DeptID", "EmployeeID", "Station", "Role", "StartTime", "EndTime"]
+
+
+def break_key(entry: ScheduleEntry) -> tuple:
+    """按内容识别 Break 记录的键"""
+    return (
+        entry.dept_id,
+        entry.employee_id,
+        entry.station,
+        entry.role,
+        entry.start_minute,
+        entry.end_minute,
+    )
+
+
+def read_generated_keys(rows) -> Counter:
+    """生成记录工作表的值元组 (首行为表头) -> 各 Break 记录键的次数"""
+    keys = Counter()
+    parser = MinuteParser()
+    for row_number, values in enumerate(rows, start=1):
+        if row_number == 1 or all(value in (None, "") for value in values):
+            continue
+        row = dict(zip(GENERATED_HEADERS, values))
+        keys[
+            (
+                normalize_text(row.get("DeptID")),
+                normalize_text(row.get("EmployeeID")),
+                normalize_text(row.get("Station")),
+                normalize_text(row.get("Role")),
+                parser.parse(row.get("StartTime"), row_number, "StartTime"),
+                parser.parse(row.get("EndTime"), row_number, "EndTime"),
+            )
+        ] += 1
+    parser.raise_failures(Config.GENERATED_SHEET)
+    return keys
+
+
+class StringPool:
+    """字符串驻留表: 字符串 <-> 整数编码 (按首次出现顺序编号)"""
+
+    __slots__ = ("values", "_codes")
+
+    def __init__(self):
+        self.values: list[str] = []
+        self._codes: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class Roster:
+    """列式排班存储
+
+    DeptID / Station / Role 以整数编码保存 (字符串驻留在各列的 StringPool 中)，
+    开始/结束时间为一天内的分钟数组 (缺失记为 NO_MINUTE)，Break 标记为字节数组。
+    每条记录只占几个定长数组元素加一个 EmployeeID 字符串。
+    """
+
+    __slots__ = (
+        "depts",
+        "stations",
+        "roles",
+        "dept_codes",
+        "station_codes",
+        "role_codes",
+        "break_flags",
+        "start_minutes",
+        "end_minutes",
+        "employee_ids",
+    )
+
+    def __init__(self):
+        self.depts = StringPool()
+        self.stations = StringPool()
+        self.roles = StringPool()
+        self.dept_codes = array("i")
+        self.station_codes = array("i")
+        self.role_codes = array("i")
+        self.break_flags = array("b")
+        self.start_minutes = array("h")
+        self.end_minutes = array("h")
+        self.employee_ids: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self.employee_ids)
+
+    def append(
+        self,
+        dept_id: str,
+        employee_id: str,
+        station: str,
+        role: str,
+        start_minute: int | None,
+        end_minute: int | None,
+        entry_type: str,
+    ) -> None:
+        self.dept_codes.append(self.depts.code(dept_id))
+        self.station_codes.append(self.stations.code(station))
+        self.role_codes.append(self.roles.code(role))
+        self.break_flags.append(entry_type.lower() == "break")
+        self.start_minutes.append(NO_MINUTE if start_minute is None else start_minute)
+        self.end_minutes.append(NO_MINUTE if end_minute is None else end_minute)
+        self.employee_ids.append(employee_id)
+
+    @classmethod
+    def from_rows(cls, rows) -> "Roster":
+        """(行号, 行字典) -> 列式排班
+
+        文本列逐行写入，起止时间先按列收集原始值，读完后整列解析 (失败汇总抛出)。
+        """
+        roster = cls()
+        row_numbers = []
+        start_values = []
+        end_values = []
+        for row_number, row in rows:
+            roster.append(
+                dept_id=normalize_text(row.get("DeptID")),
+                employee_id=normalize_text(row.get("EmployeeID")),
+                station=normalize_text(row.get("Station")),
+                role=normalize_text(row.get("Role")),
+                start_minute=None,
+                end_minute=None,
+                entry_type=normalize_text(row.get("Type")) or "Work",
+            )
+            row_numbers.append(row_number)
+            start_values.append(row.get("StartTime") or row.get("Start"))
+            end_values.append(row.get("EndTime") or row.get("End"))
+
+        parser = MinuteParser()
+        for target, values, column in (
+            (roster.start_minutes, start_values, "StartTime"),
+            (roster.end_minutes, end_values, "EndTime"),
+        ):
+            for index, minute in enumerate(parser.parse_column(values, row_numbers, column)):
+                if minute is not None:
+                    target[index] = minute
+        parser.raise_failures(Config.SCHEDULE_TABLE)
+        return roster
+
+    def entry(self, index: int) -> ScheduleEntry:
+        start = self.start_minutes[index]
+        end = self.end_minutes[index]
+        return ScheduleEntry(
+            dept_id=self.depts.values[self.dept_codes[index]],
+            employee_id=self.employee_ids[index],
+            station=self.stations.values[self.station_codes[index]],
+            role=self.roles.values[self.role_codes[index]],
+            start_minute=None if start == NO_MINUTE else start,
+            end_minute=None if end == NO_MINUTE else end,
+            entry_type="Break" if self.break_flags[index] else "Work",
+        )
+
+    def iter_breaks(self, excluded=frozenset()):
+        """生成 (行号, DeptID, 开始分钟, 结束分钟)，仅含起止时间完整且不在 excluded 中的 Break 记录"""
+        dept_values = self.depts.values
+        for index, is_break in enumerate(self.break_flags):
+            if not is_break or index in excluded:
+                continue
+            start = self.start_minutes[index]
+            end = self.end_minutes[index]
+            if start == NO_MINUTE or end == NO_MINUTE:
+                continue
+            yield index, dept_values[self.dept_codes[index]], start, end
+
+    def match_breaks(self, keys: Counter) -> set[int]:
+        """按内容匹配 Break 记录，每个键匹配的条数不超过 keys 中的次数，返回匹配的行号"""
+        remaining = Counter(keys)
+        matched = set()
+        if not remaining:
+            return matched
+        for index, is_break in enumerate(self.break_flags):
+            if not is_break:
+                continue
+            key = break_key(self.entry(index))
+            if remaining[key] > 0:
+                remaining[key] -= 1
+                matched.add(index)
+        return matched
+
+    def group_employees(self) -> dict[str, dict[tuple[str, str], list[str]]]:
+        """非 Break 记录分组: DeptID -> (Station, Role) -> 按 EmployeeID 排序的员工
+
+        分组为按整数组合键 (部门, 站位, 工种编码) 的一次排序；部门与组的顺序按首次出现排列。
+        """
+        dept_codes, station_codes, role_codes = (
+            self.dept_codes,
+            self.station_codes,
+            self.role_codes,
+        )
+        station_count = len(self.stations)
+        role_count = len(self.roles)
+        group_keys = {
+            index: (dept_codes[index] * station_count + station_codes[index]) * role_count
+            + role_codes[index]
+            for index, is_break in enumerate(self.break_flags)
+            if not is_break
+        }
+        employee_ids = self.employee_ids
+        ordered = sorted(group_keys, key=lambda index: (group_keys[index], employee_ids[index]))
+
+        runs = []
+        run_start = 0
+        for position in range(1, len(ordered) + 1):
+            if (
+                position == len(ordered)
+                or group_keys[ordered[position]] != group_keys[ordered[run_start]]
+            ):
+                run = ordered[run_start:position]
+                runs.append((min(run), run))
+                run_start = position
+        runs.sort(key=lambda item: item[0])
+
+        grouped = {}
+        for first_index, run in runs:
+            dept_id = self.depts.values[dept_codes[first_index]]
+            key = (
+                self.stations.values[station_codes[first_index]],
+                self.roles.values[role_codes[first_index]],
+            )
+            grouped.setdefault(dept_id, {})[key] = [employee_ids[index] for index in run]
+        return grouped
+
+    def work_starts(self) -> dict[str, list[int]]:
+        """各部门非 Break 记录的上班时间 (分钟)"""
+        starts = {}
+        dept_values = self.depts.values
+        for index, is_break in enumerate(self.break_flags):
+            start = self.start_minutes[index]
+            if is_break or start == NO_MINUTE:
+                continue
+            starts.setdefault(dept_values[self.dept_codes[index]], []).append(start)
+        return starts
+
+
+class TableReader:
+    """只读表格读取器
+
+    以 read_only 模式打开工作簿，一次解析所需表的位置并按值元组流式读取；
+    解析结果按工作簿文件签名 (修改时间 + 大小) 缓存，文件未变化时重复读取直接命中缓存。
+    """
+
+    def __init__(self, workbook_path: Path):
+        self.workbook_path = workbook_path
+        self._signature = None
+        self._records = {}
+
+    def _file_signature(self):
+        stat = self.workbook_path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self) -> None:
+        signature = self._file_signature()
+        if signature != self._signature:
+            self._records.clear()
+            self._signature = signature
+
+    def read_sheet(self, title: str, parser):
+        """读取普通工作表 (非表对象) 的值元组；工作表不存在时 parser 收到空迭代器"""
+        self._refresh()
+        key = ("sheet", title)
+        if key not in self._records:
+            wb = openpyxl.load_workbook(self.workbook_path, read_only=True)
+            try:
+                rows = wb[title].iter_rows(values_only=True) if title in wb.sheetnames else iter(())
+                self._records[key] = parser(rows)
+            finally:
+                wb.close()
+        return self._records[key]
+
+    def read_tables(self, parsers) -> dict[str, object]:
+        """读取多个表: parsers 为 表名 -> 行字典迭代器到解析结果的函数"""
+        self._refresh()
+
+        pending = [name for name in parsers if name not in self._records]
+        if pending:
+            logger.info("读取表: %s", ", ".join(pending))
+            locations = resolve_table_refs(self.workbook_path)
+            wb = openpyxl.load_workbook(self.workbook_path, read_only=True)
+            try:
+                for name in pending:
+                    if name not in locations:
+                        raise ValueError(f"未找到表: {name}")
+                    title, ref = locations[name]
+                    self._records[name] = parsers[name](iter_table_rows(wb[title], ref))
+            finally:
+                wb.close()
+
+        return {name: self._records[name] for name in parsers}
+
+
+def resolve_batch_count(rule: BreakRule, employee_count: int) -> int:
+    if rule.batch_count:
+        return max(rule.batch_count, 1)
+    if rule.batch_size:
+        return max(math.ceil(employee_count / rule.batch_size), 1)
+    return 1
+
+
+def resolve_batch_size(rule: BreakRule, employee_count: int, batch_count: int) -> int:
+    if rule.batch_size:
+        return max(rule.batch_size, 1)
+    return max(math.ceil(employee_count / batch_count), 1)
+
+
+def place_group(
+    employees: list[str],
+    slots: list[tuple[int, int]],
+    capacity: int,
+    limit: int,
+    existing: BreakIntervalIndex,
+    placed: BreakIntervalIndex | None,
+):
+    """在休息时段间分配一个站位/工种组的员工
+
+    每名员工放入本组人数最少的可行时段 (站位覆盖均衡)，其次选部门休息人数最少者。
+    时段可行: 本组人数 < capacity 且部门同时休息人数 + 1 <= limit。
+    placed 为 None 时上限只按本组计，否则累计部门内本次已安排的休息。
+    返回 (每个时段的员工列表, [(员工, 超限最少的时段序号, 所需人数)])。
+    """
+    assigned = [[] for _ in slots]
+    unplaced = []
+    base_counts = [existing.count_overlapping(start, end) for start, end in slots]
+
+    for employee in employees:
+        best = None
+        fallback = None
+        for slot_index, (start, end) in enumerate(slots):
+            group_load = len(assigned[slot_index])
+            dept_load = base_counts[slot_index] + (
+                group_load if placed is None else placed.count_overlapping(start, end)
+            )
+            if fallback is None or dept_load < fallback[1]:
+                fallback = (slot_index, dept_load)
+            if group_load >= capacity or dept_load + 1 > limit:
+                continue
+            candidate = (group_load, dept_load, slot_index)
+            if best is None or candidate < best:
+                best = candidate
+
+        if best is None:
+            unplaced.append((employee, fallback[0], fallback[1] + 1))
+            continue
+
+        slot_index = best[2]
+        assigned[slot_index].append(employee)
+        if placed is not None:
+            placed.add(*slots[slot_index])
+
+    return assigned, unplaced
+
+
+def schedule_department(
+    dept_id: str,
+    rules: list[tuple[int, BreakRule]],
+    groups: dict[tuple[str, str], list[str]],
+    timeline: ShiftTimeline,
+    existing: BreakIntervalIndex,
+):
+    """为单个部门按规则安排休息 (可在子进程中执行)
+
+    rules 为 (规则序号, 规则) 列表，groups 为 (Station, Role) -> 已排序的 EmployeeID。返回 ([(规则序号, 休息记录列表)], 违规列表, 首个错误)，
+    错误为 (规则序号, 信息) 或 None。
+    """
+    # 本次运行已安排的休息，供 MaxConcurrent 校验
+    placed = BreakIntervalIndex()
+    results = []
+    violations = []
+
+    for rule_index, rule in rules:
+        window_start, window_end = timeline.span(rule.break_start, rule.break_end)
+        total_minutes = window_end - window_start
+        if total_minutes <= 0:
+            return results, violations, (rule_index, f"DeptID {dept_id} 休息段时长无效")
+
+        # 人数多的组先安排，输出仍按组的原始顺序
+        placements = {}
+        for key in sorted(groups, key=lambda item: (-len(groups[item]), item)):
+            employees = groups[key]
+            employee_count = len(employees)
+            batch_count = resolve_batch_count(rule, employee_count)
+            batch_size = resolve_batch_size(rule, employee_count, batch_count)
+            slots = [
+                (
+                    window_start + total_minutes * batch_index // batch_count,
+                    window_start + total_minutes * (batch_index + 1) // batch_count,
+                )
+                for batch_index in range(batch_count)
+            ]
+            limit = rule.max_concurrent or batch_size
+            # 未显式配置 MaxConcurrent 时，上限按批次计，不累计同次运行的其他批次
+            assigned, unplaced = place_group(
+                employees,
+                slots,
+                capacity=batch_size,
+                limit=limit,
+                existing=existing,
+                placed=placed if rule.max_concurrent is not None else None,
+            )
+            placements[key] = (slots, assigned)
+            for employee_id, slot_index, required in unplaced:
+                start, end = slots[slot_index]
+                violations.append(
+                    PlacementViolation(
+                        dept_id=dept_id,
+                        employee_id=employee_id,
+                        station=key[0],
+                        role=key[1],
+                        start_minute=timeline.to_minute(start),
+                        end_minute=timeline.to_minute(end),
+                        required=required,
+                        limit=limit,
+                    )
+                )
+
+        rule_breaks = []
+        for station, role in groups:
+            slots, assigned = placements[(station, role)]
+            for (start, end), members in zip(slots, assigned):
+                for member in members:
+                    rule_breaks.append(
+                        ScheduleEntry(
+                            dept_id=dept_id,
+                            employee_id=member,
+                            station=station,
+                            role=role,
+                            start_minute=timeline.to_minute(start),
+                            end_minute=timeline.to_minute(end),
+                            entry_type="Break",
+                        )
+                    )
+        results.append((rule_index, rule_breaks))
+
+    return results, violations, None
 
 
 class BreakScheduler:
     """休息排班器"""
 
-    def __init__(self, workbook_path: Path):
+    def __init__(self, workbook_path: Path, workers: int = 1):
         self.workbook_path = workbook_path
+        self.workers = workers
+        self.reader = TableReader(workbook_path)
         self.wb = None
 
     def load_workbook(self):
@@ -169,213 +896,261 @@ class BreakScheduler:
         backup_path.write_bytes(self.workbook_path.read_bytes())
         logger.info("备份创建成功: %s", backup_path)
 
-    def load_break_rules(self) -> list[BreakRule]:
-        _, _, _, rows = read_table_rows(self.wb, Config.BREAK_RULES_TABLE)
-        rules = []
-        for row in rows:
-            dept_id = normalize_text(row.get("DeptID"))
-            if not dept_id:
-                continue
-            break_start = parse_time(row.get("BreakStart"))
-            break_end = parse_time(row.get("BreakEnd"))
-            batch_count = row.get("BatchCount")
-            batch_size = row.get("BatchSize")
-            max_concurrent = row.get("MaxConcurrent")
-            rules.append(
-                BreakRule(
-                    dept_id=dept_id,
-                    break_start=break_start,
-                    break_end=break_end,
-                    batch_count=int(batch_count) if batch_count else None,
-                    batch_size=int(batch_size) if batch_size else None,
-                    max_concurrent=int(max_concurrent) if max_concurrent else None,
-                )
-            )
-        return rules
-
-    def load_schedule_entries(self) -> tuple[list[ScheduleEntry], list[str], object, object]:
-        ws, table, headers, rows = read_table_rows(self.wb, Config.SCHEDULE_TABLE)
-        entries = []
-        for row in rows:
-            dept_id = normalize_text(row.get("DeptID"))
-            employee_id = normalize_text(row.get("EmployeeID"))
-            station = normalize_text(row.get("Station"))
-            role = normalize_text(row.get("Role"))
-            entry_type = normalize_text(row.get("Type")) or "Work"
-            start_time = parse_time(row.get("StartTime") or row.get("Start"))
-            end_time = parse_time(row.get("EndTime") or row.get("End"))
-            entries.append(
-                ScheduleEntry(
-                    dept_id=dept_id,
-                    employee_id=employee_id,
-                    station=station,
-                    role=role,
-                    start_time=start_time,
-                    end_time=end_time,
-                    entry_type=entry_type,
-                )
-            )
-        return entries, headers, ws, table
+    def load_tables(self) -> dict[str, object]:
+        return self.reader.read_tables(
+            {
+                Config.BREAK_RULES_TABLE: lambda rows: list(iter_break_rules(rows)),
+                Config.SCHEDULE_TABLE: Roster.from_rows,
+            }
+        )
 
-    def resolve_batch_count(self, rule: BreakRule, employee_count: int) -> int:
-        if rule.batch_count:
-            return max(rule.batch_count, 1)
-        if rule.batch_size:
-            return max(math.ceil(employee_count / rule.batch_size), 1)
-        return 1
+    def load_break_rules(self) -> list[BreakRule]:
+        return self.load_tables()[Config.BREAK_RULES_TABLE]
 
-    def resolve_batch_size(self, rule: BreakRule, employee_count: int, batch_count: int) -> int:
-        if rule.batch_size:
-            return max(rule.batch_size, 1)
-        return max(math.ceil(employee_count / batch_count), 1)
+    def load_schedule_entries(self) -> Roster:
+        return self.load_tables()[Config.SCHEDULE_TABLE]
 
-    def group_employees(self, entries: list[ScheduleEntry]):
-        grouped = {}
-        for entry in entries:
-            if entry.entry_type.lower() == "break":
-                continue
-            key = (entry.dept_id, entry.station, entry.role)
-            grouped.setdefault(key, []).append(entry)
-        return grouped
+    def group_employees(self, roster: Roster) -> dict[str, dict[tuple[str, str], list[str]]]:
+        """两级索引: DeptID -> (Station, Role) -> 按 EmployeeID 排序的员工"""
+        return roster.group_employees()
 
-    def build_existing_break_counts(self, entries: list[ScheduleEntry]):
-        existing = []
-        for entry in entries:
-            if entry.entry_type.lower() != "break":
+    def build_shift_timelines(self, roster: Roster, rules: list[BreakRule]):
+        starts = roster.work_starts()
+        timelines = {}
+        for rule in rules:
+            if rule.dept_id in timelines or rule.break_start is None:
                 continue
-            if not entry.start_time or not entry.end_time:
+            timelines[rule.dept_id] = ShiftTimeline.from_starts(
+                starts.get(rule.dept_id, ()), default=rule.break_start
+            )
+        return timelines
+
+    def load_generated_keys(self) -> Counter:
+        return self.reader.read_sheet(Config.GENERATED_SHEET, read_generated_keys)
+
+    def build_existing_break_counts(
+        self, roster: Roster, timelines: dict[str, ShiftTimeline], generated: set[int]
+    ) -> dict[str, BreakIntervalIndex]:
+        """生成记录之外的 Break 记录 (手工安排) 计入并发占用；此前生成的行重跑时整体替换"""
+        intervals = {}
+        for _, dept_id, start, end in roster.iter_breaks(excluded=generated):
+            timeline = timelines.get(dept_id)
+            if timeline is None:
                 continue
-            existing.append(entry)
-        return existing
+            intervals.setdefault(dept_id, []).append(timeline.span(start, end))
+        return {
+            dept_id: BreakIntervalIndex(dept_intervals)
+            for dept_id, dept_intervals in intervals.items()
+        }
 
     def insert_breaks(self) -> list[ScheduleEntry]:
         rules = self.load_break_rules()
-        entries, _, _, _ = self.load_schedule_entries()
-        grouped = self.group_employees(entries)
-        existing_breaks = self.build_existing_break_counts(entries)
-
-        new_breaks = []
-        for rule in rules:
-            if not rule.break_start or not rule.break_end:
-                raise ValueError(f"DeptID {rule.dept_id} 缺少 BreakStart/BreakEnd")
-
-            matching_groups = {
-                key: value for key, value in grouped.items() if key[0] == rule.dept_id
-            }
-            if not matching_groups:
-                continue
-
-            total_minutes = time_minutes(rule.break_start, rule.break_end)
-            if total_minutes <= 0:
-                raise ValueError(f"DeptID {rule.dept_id} 休息段时长无效")
-
-            for (_, station, role), employees in matching_groups.items():
-                employee_count = len(employees)
-                batch_count = self.resolve_batch_count(rule, employee_count)
-                batch_size = self.resolve_batch_size(rule, employee_count, batch_count)
-                slot_minutes = total_minutes / batch_count
-                max_concurrent = rule.max_concurrent or batch_size
-
-                sorted_employees = sorted(
-                    employees, key=lambda item: (item.station, item.role, item.employee_id)
-                )
-
-                for batch_index in range(batch_count):
-                    batch_start = add_minutes(rule.break_start, slot_minutes * batch_index)
-                    batch_end = add_minutes(
-                        rule.break_start, slot_minutes * (batch_index + 1)
-                    )
-                    batch_members = sorted_employees[
-                        batch_index * batch_size : (batch_index + 1) * batch_size
-                    ]
-                    if not batch_members:
-                        continue
-
-                    existing_count = sum(
-                        1
-                        for entry in existing_breaks
-                        if entry.dept_id == rule.dept_id
-                        and entry.start_time
-                        and entry.end_time
-                        and overlap(entry.start_time, entry.end_time, batch_start, batch_end)
-                    )
-                    proposed_count = existing_count + len(batch_members)
-                    if proposed_count > max_concurrent:
-                        raise ValueError(
-                            f"DeptID {rule.dept_id} 在 {batch_start}-{batch_end} 休息人数超限"
-                        )
-
-                    for member in batch_members:
-                        new_breaks.append(
-                            ScheduleEntry(
-                                dept_id=member.dept_id,
-                                employee_id=member.employee_id,
-                                station=station,
-                                role=role,
-                                start_time=batch_start,
-                                end_time=batch_end,
-                                entry_type="Break",
-                            )
-                        )
-
-        return new_breaks
+        roster = self.load_schedule_entries()
+        grouped = self.group_employees(roster)
+        timelines = self.build_shift_timelines(roster, rules)
+        generated = roster.match_breaks(self.load_generated_keys())
+        existing_index = self.build_existing_break_counts(roster, timelines, generated)
+
+        # 错误以 (规则序号, 信息) 记录，最终抛出序号最小者，与逐条规则串行执行时一致
+        errors = []
+        dept_rules = {}
+        for rule_index, rule in enumerate(rules):
+            if rule.break_start is None or rule.break_end is None:
+                errors.append((rule_index, f"DeptID {rule.dept_id} 缺少 BreakStart/BreakEnd"))
+                break
+            if rule.dept_id in grouped:
+                dept_rules.setdefault(rule.dept_id, []).append((rule_index, rule))
+
+        tasks = [
+            (
+                dept_id,
+                rule_list,
+                grouped[dept_id],
+                timelines[dept_id],
+                existing_index.get(dept_id) or BreakIntervalIndex(),
+            )
+            for dept_id, rule_list in dept_rules.items()
+        ]
+
+        rule_breaks = []
+        violations = []
+        for results, dept_violations, error in self.run_department_tasks(tasks):
+            rule_breaks.extend(results)
+            violations.extend(dept_violations)
+            if error:
+                errors.append(error)
+        if errors:
+            raise ValueError(min(errors)[1])
+        if violations:
+            raise BreakPlacementError(violations)
+
+        rule_breaks.sort(key=lambda item: item[0])
+        return [entry for _, breaks in rule_breaks for entry in breaks]
+
+    def run_department_tasks(self, tasks):
+        if self.workers <= 1 or len(tasks) <= 1:
+            return [schedule_department(*task) for task in tasks]
+
+        setup_logging()
+        max_workers = min(self.workers, len(tasks))
+        logger.info("并行排班: %s 个部门, %s 个进程", len(tasks), max_workers)
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=setup_logging, initargs=(_log_file,)
+        ) as executor:
+            return list(executor.map(schedule_department, *zip(*tasks)))
+
+    def write_generated_record(self, breaks: list[ScheduleEntry], previous_keys: Counter) -> bool:
+        """把本次生成的 Break 记录写入隐藏工作表，内容变化时返回 True"""
+        if Counter(break_key(entry) for entry in breaks) == previous_keys and (
+            Config.GENERATED_SHEET in self.wb.sheetnames
+        ):
+            return False
+        if Config.GENERATED_SHEET in self.wb.sheetnames:
+            ws = self.wb[Config.GENERATED_SHEET]
+            ws.delete_rows(1, ws.max_row)
+        else:
+            ws = self.wb.create_sheet(Config.GENERATED_SHEET)
+            ws.sheet_state = "hidden"
+        ws.append(GENERATED_HEADERS)
+        for entry in breaks:
+            ws.append(
+                [
+                    entry.dept_id,
+                    entry.employee_id,
+                    entry.station,
+                    entry.role,
+                    None if entry.start_minute is None else minute_to_time(entry.start_minute),
+                    None if entry.end_minute is None else minute_to_time(entry.end_minute),
+                ]
+            )
+        return True
 
-    def write_breaks(self, breaks: list[ScheduleEntry]):
+    def write_breaks(self, breaks: list[ScheduleEntry]) -> WriteSummary:
+        """一次性重写 Schedule 表体: 保留手工行，以本次结果替换此前生成的 Break 行 (按生成记录匹配内容)"""
         if not breaks:
             logger.info("未生成休息安排")
-            return
 
-        _, headers, ws, table = self.load_schedule_entries()
+        ws, table = find_table(self.wb, Config.SCHEDULE_TABLE)
+        if Config.GENERATED_SHEET in self.wb.sheetnames:
+            previous_keys = read_generated_keys(
+                self.wb[Config.GENERATED_SHEET].iter_rows(values_only=True)
+            )
+        else:
+            previous_keys = Counter()
+        min_col, min_row, max_col, max_row = range_boundaries(table.ref)
+        table_rows = [
+            list(values)
+            for values in ws.iter_rows(
+                min_row=min_row,
+                max_row=max_row,
+                min_col=min_col,
+                max_col=max_col,
+                values_only=True,
+            )
+        ]
+        headers = [normalize_text(value) for value in table_rows[0]]
+        old_body = table_rows[1:]
         header_map = {header: idx for idx, header in enumerate(headers)}
 
-        start_col = min(cell.col_idx for cell in ws[table.ref][0])
-        end_col = start_col + len(headers) - 1
-
-        start_row = ws[table.ref][0][0].row
-        end_row = ws[table.ref][-1][0].row
+        def entry_key(entry: ScheduleEntry):
+            return entry.dept_id, entry.employee_id, entry.station, entry.role
 
         def build_row(entry: ScheduleEntry):
-            values = [""] * len(headers)
+            values = [None] * len(headers)
+            start_time = end_time = None
+            if entry.start_minute is not None:
+                start_time = minute_to_time(entry.start_minute)
+            if entry.end_minute is not None:
+                end_time = minute_to_time(entry.end_minute)
             for name, value in [
                 ("DeptID", entry.dept_id),
                 ("EmployeeID", entry.employee_id),
                 ("Station", entry.station),
                 ("Role", entry.role),
                 ("Type", entry.entry_type),
-                ("StartTime", entry.start_time),
-                ("EndTime", entry.end_time),
-                ("Start", entry.start_time),
-                ("End", entry.end_time),
+                ("StartTime", start_time),
+                ("EndTime", end_time),
+                ("Start", start_time),
+                ("End", end_time),
             ]:
                 if name in header_map and value is not None:
                     values[header_map[name]] = value
             return values
 
-        for entry in breaks:
-            end_row += 1
-            row_values = build_row(entry)
-            for offset, value in enumerate(row_values):
-                ws.cell(row=end_row, column=start_col + offset, value=value)
-
-        table.ref = (
-            f"{get_column_letter(start_col)}{start_row}:"
-            f"{get_column_letter(end_col)}{end_row}"
+        filled = [
+            (min_row + 1 + offset, values)
+            for offset, values in enumerate(old_body)
+            if not all(value in (None, "") for value in values)
+        ]
+        table_roster = Roster.from_rows(
+            (row_number, dict(zip(headers, values))) for row_number, values in filled
+        )
+        if not previous_keys and any(table_roster.break_flags):
+            logger.warning(
+                "没有生成记录 (%s): 已有的 Break 行均视为手工安排，如含旧版本生成的行请手工删除",
+                Config.GENERATED_SHEET,
+            )
+        generated_rows = set()
+        previous = Counter()
+        for index in table_roster.match_breaks(previous_keys):
+            generated_rows.add(id(filled[index][1]))
+            previous[entry_key(table_roster.entry(index))] += 1
+        body = [values for values in old_body if id(values) not in generated_rows]
+
+        current = Counter(entry_key(entry) for entry in breaks)
+        body.extend(build_row(entry) for entry in breaks)
+
+        # 仅写入内容发生变化的行，表体缩短时清空多余行
+        rows_written = 0
+        empty_row = [None] * len(headers)
+        for offset in range(max(len(body), len(old_body))):
+            values = body[offset] if offset < len(body) else empty_row
+            if offset < len(old_body) and old_body[offset] == values:
+                continue
+            row_idx = min_row + 1 + offset
+            for col_offset, value in enumerate(values):
+                # ws.cell(value=None) 不会清空单元格，需直接赋值
+                ws.cell(row=row_idx, column=min_col + col_offset).value = value
+            rows_written += 1
+
+        end_row = min_row + max(len(body), 1)
+        table.ref = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{end_row}"
+        if table.autoFilter is not None:
+            table.autoFilter.ref = table.ref
+
+        summary = WriteSummary(
+            inserted=sum((current - previous).values()),
+            replaced=sum((current & previous).values()),
+            removed=sum((previous - current).values()),
+            rows_written=rows_written,
+            record_updated=self.write_generated_record(breaks, previous_keys),
+        )
+        logger.info(
+            "写入休息安排: 新增 %s 条, 替换 %s 条, 删除 %s 条 (改写 %s 行)",
+            summary.inserted,
+            summary.replaced,
+            summary.removed,
+            summary.rows_written,
         )
-        logger.info("写入休息安排: %s 条", len(breaks))
+        return summary
 
     def run(self):
-        self.load_workbook()
+        setup_logging()
         self.create_backup(Config.BACKUP_FILE)
         breaks = self.insert_breaks()
-        self.write_breaks(breaks)
-        self.wb.save(self.workbook_path)
+        self.load_workbook()
+        summary = self.write_breaks(breaks)
+        if summary.rows_written or summary.record_updated:
+            self.wb.save(self.workbook_path)
+        else:
+            logger.info("Schedule 表无变化，跳过保存")
         logger.info("休息排班完成")
 
 
-def InsertBreaks(workbook_path: Path | None = None):
-    """入口函数"""
+def InsertBreaks(workbook_path: Path | None = None, workers: int = 1):
+    """入口函数 (workers > 1 时按 DeptID 分进程并行排班)"""
     path = workbook_path or Config.INPUT_FILE
-    scheduler = BreakScheduler(Path(path))
+    scheduler = BreakScheduler(Path(path), workers=workers)
     scheduler.run()
 
 
@@ -5,18 +5,36 @@ Master 排班汇总生成器
 1. 规范 Master 输出字段: DeptID, Name, Station, StartTime, EndTime, Breaks
 2. 汇总各部门排班表追加到 Master 表
 3. 最终按 DeptID -> Station -> Name 排序
-4. 可选保存副本 (导出)
+4. 可选保存副本 (导出)；导出与备份均记录到去重的快照存储
 """
 
 from __future__ import annotations
 
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape, quoteattr
+import hashlib
+import heapq
+import importlib.util
+import json
 import logging
+import math
+import os
+import pickle
+import posixpath
+import re
 import shutil
+import sys
+import zipfile
 
 import openpyxl
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import to_excel
+import numpy as np
 import pandas as pd
 
 
@@ -32,7 +50,11 @@ class Config:
     BASE_DIR = Path(r"C:\Projects\Production_management\Production_Operations_Dashboard")
     INPUT_FILE = BASE_DIR / "data" / "v39_Normalized_Colored.xlsx"
     OUTPUT_FILE = BASE_DIR / "data" / "v39_Normalized_Colored.xlsx"
-    BACKUP_FILE = BASE_DIR / "data" / "v39_Normalized_Colored_backup_before_master.xlsx"
+    # 备份与导出副本记录为快照 (按部件去重)，用 snapshot_store.py restore 还原
+    SNAPSHOT_DIR = BASE_DIR / "data" / "snapshots"
+    # 快照存储模块与 Production_Operations_Dashboard 的脚本共用，按此路径加载
+    SNAPSHOT_STORE_MODULE = BASE_DIR / "automation" / "snapshot_store.py"
+    BACKUP_LABEL = "v39_Normalized_Colored_before_master"
     LOG_DIR = BASE_DIR / "logs"
 
     MASTER_SHEET = "Master"
@@ -46,17 +68,47 @@ class Config:
 
     # 可选: 保存副本
     SAVE_COPY = True
-    EXPORT_DIR = BASE_DIR / "exports"
+    EXPORT_LABEL = "master_schedule"
+
+    # 增量重建: 按部门工作表指纹缓存规范化后的部门数据
+    INCREMENTAL = True
+    CACHE_DIR = BASE_DIR / "cache" / "master_schedule"
+    # 规范化逻辑变化时递增，使旧缓存失效
+    CACHE_VERSION = 2
+
+    # 大于 1 时按部门分进程并行读取 (每个进程单独打开工作簿)
+    WORKERS = 1
 
 
 OUTPUT_COLUMNS = ["DeptID", "Name", "Station", "StartTime", "EndTime", "Breaks"]
 DATA_COLUMNS = ["Name", "Station", "StartTime", "EndTime", "Breaks"]
 
+# xlsx 包内 XML 命名空间与类型
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+DOC_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+WORKSHEET_REL_TYPE = f"{DOC_REL_NS}/worksheet"
+STYLES_REL_TYPE = f"{DOC_REL_NS}/styles"
+OFFICE_DOCUMENT_REL_TYPE = f"{DOC_REL_NS}/officeDocument"
+WORKSHEET_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+
+
+logger = logging.getLogger(__name__)
+_log_file: Path | None = None
+
+
+def setup_logging(log_file: Path | None = None) -> logging.Logger:
+    """设置日志系统 (由入口调用，不在导入时执行)
+
+    工作进程由进程池 initializer 传入主进程的日志文件并追加写入，已配置过时直接返回。
+    """
+    global _log_file
+    if _log_file is not None:
+        return logger
 
-def setup_logging() -> logging.Logger:
-    """设置日志系统"""
-    Config.LOG_DIR.mkdir(parents=True, exist_ok=True)
-    log_file = Config.LOG_DIR / f"master_schedule_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
+    if log_file is None:
+        Config.LOG_DIR.mkdir(parents=True, exist_ok=True)
+        log_file = Config.LOG_DIR / f"master_schedule_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
 
     logging.basicConfig(
         level=logging.INFO,
@@ -66,16 +118,14 @@ def setup_logging() -> logging.Logger:
             logging.StreamHandler(),
         ],
     )
-    return logging.getLogger(__name__)
+    _log_file = log_file
+    return logger
 
 
-logger = setup_logging()
-
-
-def build_department_df(source_path: Path, dept: DepartmentConfig) -> pd.DataFrame:
-    """读取部门工作表并规范字段"""
+def build_department_df(workbook: pd.ExcelFile, dept: DepartmentConfig) -> pd.DataFrame:
+    """从已打开的工作簿读取部门工作表并规范字段"""
     logger.info("读取部门工作表: %s", dept.sheet_name)
-    df = pd.read_excel(source_path, sheet_name=dept.sheet_name, header=0)
+    df = workbook.parse(sheet_name=dept.sheet_name, header=0)
 
     for column in DATA_COLUMNS:
         if column not in df.columns:
@@ -91,39 +141,340 @@ def build_department_df(source_path: Path, dept: DepartmentConfig) -> pd.DataFra
         if df[column].dtype == "float64":
             df[column] = df[column].fillna("")
 
-    return df
+    return sort_department_df(df)
+
+
+def casefold_key(value) -> str:
+    """排序键: 空值视为空串，其余转字符串后 casefold"""
+    return "" if pd.isna(value) else str(value).casefold()
+
+
+def rank_codes(series: pd.Series) -> np.ndarray:
+    """把列编码为有序整数秩 (与按 casefold 字符串排序等价)"""
+    keys = series.fillna("").astype(str).str.casefold()
+    categories = sorted(keys.unique())
+    return pd.Categorical(keys, categories=categories, ordered=True).codes
+
 
+def sort_department_df(df: pd.DataFrame) -> pd.DataFrame:
+    """部门内按 Station -> Name 稳定排序 (DeptID 在部门内恒定)"""
+    if len(df) < 2:
+        return df.reset_index(drop=True)
+    order = np.lexsort((rank_codes(df["Name"]), rank_codes(df["Station"])))
+    return df.take(order).reset_index(drop=True)
 
-def combine_departments(source_path: Path) -> pd.DataFrame:
-    """汇总所有部门数据"""
-    frames = []
+
+def merge_sorted_departments(
+    frames: list[tuple[DepartmentConfig, pd.DataFrame]],
+) -> pd.DataFrame:
+    """k 路归并已排序的部门数据
+
+    结果与按 DeptID -> Station -> Name (casefold) 对拼接结果做稳定排序一致:
+    DeptID 不同的部门按键整体排列；键相同的部门按行归并，相等时先取配置中靠前的部门。
+    """
+    groups: dict[str, list[pd.DataFrame]] = {}
+    for dept, df in frames:
+        groups.setdefault(casefold_key(dept.dept_id), []).append(df)
+
+    pieces = []
+    for dept_key in sorted(groups):
+        group = groups[dept_key]
+        if len(group) == 1:
+            pieces.append(group[0])
+            continue
+
+        runs = []
+        offset = 0
+        for df in group:
+            keys = zip(map(casefold_key, df["Station"]), map(casefold_key, df["Name"]))
+            runs.append(zip(keys, range(offset, offset + len(df))))
+            offset += len(df)
+        positions = [position for _, position in heapq.merge(*runs, key=lambda item: item[0])]
+        pieces.append(pd.concat(group, ignore_index=True).take(positions))
+
+    return pd.concat(pieces, ignore_index=True)
+
+
+def load_department(source_path: Path, dept: DepartmentConfig) -> pd.DataFrame:
+    """在工作进程中单独打开工作簿读取一个部门"""
+    with pd.ExcelFile(source_path) as workbook:
+        return build_department_df(workbook, dept)
+
+
+def iter_department_results(source_path: Path, depts: list[DepartmentConfig], workers: int = 1):
+    """按配置顺序产出 (部门, 取结果函数)；取结果时抛出该部门的 ValueError"""
+    if workers <= 1 or len(depts) <= 1:
+        with pd.ExcelFile(source_path) as workbook:
+            for dept in depts:
+                yield dept, lambda dept=dept: build_department_df(workbook, dept)
+        return
+
+    setup_logging()
+    max_workers = min(workers, len(depts))
+    logger.info("并行读取部门: %s 个部门, %s 个进程", len(depts), max_workers)
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=setup_logging, initargs=(_log_file,)
+    ) as executor:
+        futures = [executor.submit(load_department, source_path, dept) for dept in depts]
+        for dept, future in zip(depts, futures):
+            yield dept, future.result
+
+
+def combine_departments(source_path: Path, fingerprints: dict[str, str] | None = None) -> pd.DataFrame:
+    """汇总所有部门数据 (工作簿只打开一次，只解析指纹变化的部门工作表)"""
+    cache = DepartmentCache(Config.CACHE_DIR) if Config.INCREMENTAL else None
+    if cache is not None and fingerprints is None:
+        fingerprints = read_sheet_fingerprints(
+            source_path, [dept.sheet_name for dept in Config.DEPARTMENTS]
+        )
+
+    loaded = {}
+    pending = []
     for dept in Config.DEPARTMENTS:
-        try:
-            frames.append(build_department_df(source_path, dept))
-        except ValueError as exc:
-            logger.error("读取部门 %s 失败: %s", dept.sheet_name, exc)
+        fingerprint = (fingerprints or {}).get(dept.sheet_name)
+        cached = cache.load(dept, fingerprint) if cache is not None else None
+        if cached is not None:
+            logger.info("部门 %s 未变化，使用缓存", dept.sheet_name)
+            loaded[dept] = cached
+        else:
+            pending.append((dept, fingerprint))
+
+    if pending:
+        fingerprints_by_dept = dict(pending)
+        depts = [dept for dept, _ in pending]
+        for dept, result in iter_department_results(source_path, depts, Config.WORKERS):
+            try:
+                loaded[dept] = result()
+            except ValueError as exc:
+                logger.error("读取部门 %s 失败: %s", dept.sheet_name, exc)
+                continue
+            fingerprint = fingerprints_by_dept[dept]
+            if cache is not None and fingerprint is not None:
+                cache.store(dept, fingerprint, loaded[dept])
+
+    frames = [(dept, loaded[dept]) for dept in Config.DEPARTMENTS if dept in loaded]
 
     if not frames:
         logger.warning("未找到任何部门数据")
         return pd.DataFrame(columns=OUTPUT_COLUMNS)
 
-    master_df = pd.concat(frames, ignore_index=True)
+    # 各部门数据在读取时已排序 (缓存中也是排序后的)，这里只做归并
+    return merge_sorted_departments(frames)
 
-    def sort_key(series: pd.Series) -> pd.Series:
-        return series.fillna("").astype(str).str.casefold()
 
-    master_df = master_df.sort_values(
-        by=["DeptID", "Station", "Name"],
-        key=sort_key,
-        kind="stable",
-    )
+@dataclass
+class PackageLayout:
+    """xlsx 包结构: 工作簿部件、工作表名 -> (sheetId, 部件路径)"""
 
-    return master_df
+    workbook_part: str
+    rels_part: str
+    styles_part: str | None
+    sheets: dict[str, tuple[int, str]]
 
 
-def write_master_sheet(workbook_path: Path, master_df: pd.DataFrame) -> None:
-    """写入 Master 工作表"""
-    logger.info("写入 Master 工作表: %s", Config.MASTER_SHEET)
+def rels_path_for(part: str) -> str:
+    folder, name = posixpath.split(part)
+    return posixpath.join(folder, "_rels", f"{name}.rels")
+
+
+def resolve_target(source_part: str, target: str) -> str:
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_part), target))
+
+
+def read_relationships(archive: zipfile.ZipFile, rels_part: str) -> list[ElementTree.Element]:
+    root = ElementTree.fromstring(archive.read(rels_part))
+    return root.findall(f"{{{PKG_REL_NS}}}Relationship")
+
+
+def read_package_layout(archive: zipfile.ZipFile) -> PackageLayout:
+    """只读取 .rels / workbook.xml，定位各工作表部件"""
+    workbook_part = next(
+        resolve_target("", rel.get("Target"))
+        for rel in read_relationships(archive, "_rels/.rels")
+        if rel.get("Type") == OFFICE_DOCUMENT_REL_TYPE
+    )
+    rels_part = rels_path_for(workbook_part)
+    targets = {}
+    styles_part = None
+    for rel in read_relationships(archive, rels_part):
+        target = resolve_target(workbook_part, rel.get("Target"))
+        if rel.get("Type") == WORKSHEET_REL_TYPE:
+            targets[rel.get("Id")] = target
+        elif rel.get("Type") == STYLES_REL_TYPE:
+            styles_part = target
+
+    root = ElementTree.fromstring(archive.read(workbook_part))
+    sheets = {}
+    for sheet in root.iter(f"{{{MAIN_NS}}}sheet"):
+        rel_id = sheet.get(f"{{{DOC_REL_NS}}}id")
+        if rel_id in targets:
+            sheets[sheet.get("name")] = (int(sheet.get("sheetId")), targets[rel_id])
+    return PackageLayout(workbook_part, rels_part, styles_part, sheets)
+
+
+def find_date_styles(archive: zipfile.ZipFile, styles_part: str | None) -> dict[str, int]:
+    """在 cellXfs 中查找已有的时间/日期样式序号 (只读，不修改样式表)"""
+    if not styles_part:
+        return {}
+    root = ElementTree.fromstring(archive.read(styles_part))
+    custom = {
+        int(fmt.get("numFmtId")): fmt.get("formatCode")
+        for fmt in root.iter(f"{{{MAIN_NS}}}numFmt")
+    }
+    cell_xfs = root.find(f"{{{MAIN_NS}}}cellXfs")
+    styles = {}
+    for index, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+        fmt_id = int(xf.get("numFmtId", 0))
+        code = custom.get(fmt_id) or BUILTIN_FORMATS.get(fmt_id)
+        if not code or not is_date_format(code):
+            continue
+        has_date = bool(re.search(r"[dy]", code.lower()))
+        has_time = bool(re.search(r"[hs]", code.lower()))
+        kind = "datetime" if has_date and has_time else "date" if has_date else "time"
+        styles.setdefault(kind, index)
+    return styles
+
+
+ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def render_cell(ref: str, value, date_styles: dict[str, int]) -> str:
+    """单元格 XML: 文本用内联字符串 (不改动 sharedStrings)，日期时间复用已有样式"""
+    if hasattr(value, "item") and not isinstance(value, str):
+        value = value.item()
+    if value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value!r}</v></c>'
+    if isinstance(value, (datetime, date, time, timedelta)):
+        if isinstance(value, datetime):
+            kind = "datetime"
+        elif isinstance(value, date):
+            kind = "date"
+        else:
+            kind = "time"
+        style = date_styles.get(kind, date_styles.get("datetime"))
+        if style is not None:
+            return f'<c r="{ref}" s="{style}"><v>{to_excel(value)!r}</v></c>'
+        value = value.isoformat()
+    text = ILLEGAL_XML_CHARS.sub("", str(value))
+    if text == "":
+        return ""
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}" t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+def iter_sheet_xml(master_df: pd.DataFrame, date_styles: dict[str, int]):
+    """流式生成 Master 工作表 XML"""
+    letters = [get_column_letter(index) for index in range(1, len(OUTPUT_COLUMNS) + 1)]
+    yield '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    yield f'<worksheet xmlns="{MAIN_NS}"><sheetData>'
+    yield render_row(1, OUTPUT_COLUMNS, letters, date_styles)
+    rows = master_df[OUTPUT_COLUMNS].itertuples(index=False, name=None)
+    for row_idx, values in enumerate(rows, start=2):
+        yield render_row(row_idx, values, letters, date_styles)
+    yield "</sheetData></worksheet>"
+
+
+def render_row(row_idx: int, values, letters: list[str], date_styles: dict[str, int]) -> str:
+    cells = "".join(
+        render_cell(f"{letter}{row_idx}", value, date_styles)
+        for letter, value in zip(letters, values)
+    )
+    return f'<row r="{row_idx}">{cells}</row>'
+
+
+def insert_before(xml: bytes, closing_tag: bytes, fragment: str) -> bytes:
+    """在 XML 文本的结束标签前插入片段，其余字节保持不变"""
+    position = xml.rfind(closing_tag)
+    if position < 0:
+        raise ValueError(f"未找到 {closing_tag.decode()}")
+    return xml[:position] + fragment.encode("utf-8") + xml[position:]
+
+
+def patch_master_part(workbook_path: Path, master_df: pd.DataFrame) -> bool:
+    """只替换 xlsx 包中的 Master 工作表部件，其余部件按原内容复制
+
+    Master 不存在时新增工作表部件并登记到 workbook.xml / rels / [Content_Types].xml。
+    Master 带有关系部件 (表格、图表等) 或被 calcChain 引用时返回 False，由调用方整体重写。
+    """
+    with zipfile.ZipFile(workbook_path) as archive:
+        layout = read_package_layout(archive)
+        part_names = set(archive.namelist())
+        patched: dict[str, bytes] = {}
+
+        if Config.MASTER_SHEET in layout.sheets:
+            sheet_id, sheet_part = layout.sheets[Config.MASTER_SHEET]
+            if rels_path_for(sheet_part) in part_names:
+                return False
+            calc_chain = next((name for name in part_names if name.endswith("calcChain.xml")), None)
+            if calc_chain and re.search(rb'\bi="%d"' % sheet_id, archive.read(calc_chain)):
+                return False
+        else:
+            index = len(layout.sheets) + 1
+            while f"xl/worksheets/sheet{index}.xml" in part_names:
+                index += 1
+            sheet_part = f"xl/worksheets/sheet{index}.xml"
+            sheet_id = max((item[0] for item in layout.sheets.values()), default=0) + 1
+            rel_ids = {rel.get("Id") for rel in read_relationships(archive, layout.rels_part)}
+            rel_index = len(rel_ids) + 1
+            while f"rId{rel_index}" in rel_ids:
+                rel_index += 1
+            rel_id = f"rId{rel_index}"
+
+            workbook_xml = archive.read(layout.workbook_part)
+            # 沿用 workbook.xml 根元素上已声明的关系命名空间前缀
+            prefix_match = re.search(rb'xmlns:(\w+)="' + DOC_REL_NS.encode() + b'"', workbook_xml)
+            if prefix_match:
+                prefix, declaration = prefix_match.group(1).decode(), ""
+            else:
+                prefix, declaration = "r", f" xmlns:r={quoteattr(DOC_REL_NS)}"
+            patched[layout.workbook_part] = insert_before(
+                workbook_xml,
+                b"</sheets>",
+                f"<sheet{declaration} name={quoteattr(Config.MASTER_SHEET)} "
+                f'sheetId="{sheet_id}" {prefix}:id="{rel_id}"/>',
+            )
+            patched[layout.rels_part] = insert_before(
+                archive.read(layout.rels_part),
+                b"</Relationships>",
+                f'<Relationship Id="{rel_id}" Type="{WORKSHEET_REL_TYPE}" '
+                f'Target="/{sheet_part}"/>',
+            )
+            patched["[Content_Types].xml"] = insert_before(
+                archive.read("[Content_Types].xml"),
+                b"</Types>",
+                f'<Override PartName="/{sheet_part}" ContentType="{WORKSHEET_CONTENT_TYPE}"/>',
+            )
+
+        date_styles = find_date_styles(archive, layout.styles_part)
+        temp_path = workbook_path.with_name(f"{workbook_path.name}.tmp")
+        with zipfile.ZipFile(temp_path, "w") as target:
+            for info in archive.infolist():
+                if info.filename == sheet_part:
+                    continue
+                if info.filename in patched:
+                    target.writestr(info, patched[info.filename])
+                    continue
+                with archive.open(info) as src, target.open(info, "w", force_zip64=True) as dst:
+                    shutil.copyfileobj(src, dst)
+
+            sheet_info = zipfile.ZipInfo(sheet_part, date_time=datetime.now().timetuple()[:6])
+            sheet_info.compress_type = zipfile.ZIP_DEFLATED
+            with target.open(sheet_info, "w", force_zip64=True) as dst:
+                for chunk in iter_sheet_xml(master_df, date_styles):
+                    dst.write(chunk.encode("utf-8"))
+
+    os.replace(temp_path, workbook_path)
+    return True
+
+
+def rewrite_master_workbook(workbook_path: Path, master_df: pd.DataFrame) -> None:
+    """用 openpyxl 整体加载并重写工作簿 (Master 带附属部件时使用)"""
     wb = openpyxl.load_workbook(workbook_path)
 
     if Config.MASTER_SHEET in wb.sheetnames:
@@ -136,32 +487,133 @@ def write_master_sheet(workbook_path: Path, master_df: pd.DataFrame) -> None:
         ws.append(list(row))
 
     wb.save(workbook_path)
+
+
+def write_master_sheet(workbook_path: Path, master_df: pd.DataFrame) -> None:
+    """写入 Master 工作表 (仅替换 Master 部件，其余工作表原样保留)"""
+    logger.info("写入 Master 工作表: %s", Config.MASTER_SHEET)
+    if not patch_master_part(workbook_path, master_df):
+        logger.info("Master 含附属部件，改为整体重写工作簿")
+        rewrite_master_workbook(workbook_path, master_df)
     logger.info("Master 工作表写入完成")
 
 
+def read_sheet_fingerprints(workbook_path: Path, sheet_names: list[str]) -> dict[str, str]:
+    """计算工作表指纹: 工作表 XML + sharedStrings / styles 部件 + 缓存版本的 SHA-256
+
+    只解压所需工作表部件，不做 XML 解析；共享部件变化时所有指纹随之变化。
+    """
+    with zipfile.ZipFile(workbook_path) as archive:
+        layout = read_package_layout(archive)
+        part_names = set(archive.namelist())
+        shared = hashlib.sha256(f"v{Config.CACHE_VERSION}".encode())
+        for name in sorted(part_names):
+            if name.endswith("sharedStrings.xml") or name == layout.styles_part:
+                shared.update(name.encode())
+                shared.update(archive.read(name))
+
+        fingerprints = {}
+        for sheet_name in sheet_names:
+            if sheet_name not in layout.sheets:
+                continue
+            digest = shared.copy()
+            digest.update(archive.read(layout.sheets[sheet_name][1]))
+            fingerprints[sheet_name] = digest.hexdigest()
+    return fingerprints
+
+
+class DepartmentCache:
+    """规范化后的部门数据缓存 (每个部门一个 pickle，内含指纹)"""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+
+    def _path(self, dept: DepartmentConfig) -> Path:
+        key = hashlib.sha1(f"{dept.dept_id}\0{dept.sheet_name}".encode("utf-8")).hexdigest()
+        return self.cache_dir / f"dept_{key[:16]}.pkl"
+
+    def load(self, dept: DepartmentConfig, fingerprint: str | None) -> pd.DataFrame | None:
+        path = self._path(dept)
+        if fingerprint is None or not path.exists():
+            return None
+        try:
+            with path.open("rb") as handle:
+                cached_fingerprint, df = pickle.load(handle)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError) as exc:
+            logger.warning("部门缓存不可用 %s: %s", path, exc)
+            return None
+        return df if cached_fingerprint == fingerprint else None
+
+    def store(self, dept: DepartmentConfig, fingerprint: str, df: pd.DataFrame) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path(dept)
+        temp_path = path.with_suffix(".tmp")
+        with temp_path.open("wb") as handle:
+            pickle.dump((fingerprint, df), handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+    @property
+    def state_path(self) -> Path:
+        return self.cache_dir / "master_state.json"
+
+    def load_state(self) -> dict:
+        try:
+            return json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def store_state(self, state: dict) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def departments_key(fingerprints: dict[str, str]) -> str:
+    """部门配置与各部门指纹的组合摘要"""
+    digest = hashlib.sha256()
+    for dept in Config.DEPARTMENTS:
+        digest.update(
+            f"{dept.dept_id}\0{dept.sheet_name}\0{fingerprints.get(dept.sheet_name)}\n".encode()
+        )
+    return digest.hexdigest()
+
+
+def open_snapshot_store():
+    """按 Config.SNAPSHOT_STORE_MODULE 加载快照存储模块，返回 SNAPSHOT_DIR 上的 SnapshotStore"""
+    module = sys.modules.get("snapshot_store")
+    if module is None:
+        module_path = Path(Config.SNAPSHOT_STORE_MODULE)
+        if not module_path.exists():
+            raise FileNotFoundError(f"未找到快照存储模块: {module_path}")
+        spec = importlib.util.spec_from_file_location("snapshot_store", module_path)
+        module = importlib.util.module_from_spec(spec)
+        # 先注册再执行，模块内的 dataclass 需要按模块名解析注解
+        sys.modules["snapshot_store"] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules["snapshot_store"]
+            raise
+    return module.SnapshotStore(Config.SNAPSHOT_DIR)
+
+
 def save_copy(source_path: Path) -> None:
     """保存副本 (导出)"""
     if not Config.SAVE_COPY:
         return
 
-    Config.EXPORT_DIR.mkdir(parents=True, exist_ok=True)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    export_path = Config.EXPORT_DIR / f"master_schedule_{timestamp}.xlsx"
-    shutil.copy2(source_path, export_path)
-    logger.info("导出副本: %s", export_path)
+    manifest = open_snapshot_store().snapshot(source_path, Config.EXPORT_LABEL)
+    logger.info("导出副本: %s", manifest.snapshot_id)
 
 
 def create_backup() -> None:
-    """创建备份"""
-    if Config.BACKUP_FILE.exists():
-        logger.info("备份已存在，跳过: %s", Config.BACKUP_FILE)
-        return
-    shutil.copy2(Config.INPUT_FILE, Config.BACKUP_FILE)
-    logger.info("备份创建成功: %s", Config.BACKUP_FILE)
+    """创建备份 (内容未变化时只新增清单，不重复存储部件)"""
+    manifest = open_snapshot_store().snapshot(Config.INPUT_FILE, Config.BACKUP_LABEL)
+    logger.info("备份创建成功: %s", manifest.snapshot_id)
 
 
 def main() -> None:
     """入口函数"""
+    setup_logging()
     logger.info("开始生成 Master 排班汇总")
 
     if not Config.INPUT_FILE.exists():
@@ -170,8 +622,39 @@ def main() -> None:
 
     create_backup()
 
-    master_df = combine_departments(Config.INPUT_FILE)
+    sheet_names = [dept.sheet_name for dept in Config.DEPARTMENTS]
+    fingerprints = None
+    if Config.INCREMENTAL:
+        cache = DepartmentCache(Config.CACHE_DIR)
+        fingerprints = read_sheet_fingerprints(Config.INPUT_FILE, sheet_names)
+        key = departments_key(fingerprints)
+        state = cache.load_state()
+        master_fingerprint = None
+        if Config.OUTPUT_FILE.exists():
+            master_fingerprint = read_sheet_fingerprints(
+                Config.OUTPUT_FILE, [Config.MASTER_SHEET]
+            ).get(Config.MASTER_SHEET)
+        if (
+            state.get("departments") == key
+            and master_fingerprint is not None
+            and state.get("master") == master_fingerprint
+        ):
+            logger.info("部门工作表与 Master 均未变化，跳过重建")
+            return
+
+    master_df = combine_departments(Config.INPUT_FILE, fingerprints)
     write_master_sheet(Config.OUTPUT_FILE, master_df)
+
+    if Config.INCREMENTAL:
+        cache.store_state(
+            {
+                "departments": key,
+                "master": read_sheet_fingerprints(Config.OUTPUT_FILE, [Config.MASTER_SHEET]).get(
+                    Config.MASTER_SHEET
+                ),
+            }
+        )
+
     save_copy(Config.OUTPUT_FILE)
 
     logger.info("Master 排班汇总完成")